@@ -0,0 +1,67 @@
+from typing import Any, Dict, List, Tuple, Type
+import os
+
+from fastapi import HTTPException
+from pydantic import BaseModel, ValidationError
+from sqlalchemy import insert
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+BULK_MAX_ITEMS = int(os.getenv("BULK_MAX_ITEMS", "10000"))
+BULK_CHUNK_SIZE = int(os.getenv("BULK_CHUNK_SIZE", "1000"))
+
+def validate_rows(items: List[Dict[str, Any]], schema: Type[BaseModel]) -> Tuple[List[Tuple[int, dict]], List[dict]]:
+    """Validate every item in one pass, returning ([(index, row)], [errors])"""
+    if len(items) > BULK_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"At most {BULK_MAX_ITEMS} items per request")
+    rows, errors = [], []
+    for index, item in enumerate(items):
+        try:
+            rows.append((index, schema(**item).dict()))
+        except (ValidationError, TypeError) as e:
+            errors.append({"index": index, "error": str(e)})
+    return rows, errors
+
+async def insert_returning_ids(db: AsyncSession, model, rows: List[dict]) -> List[int]:
+    """One multi-row INSERT ... VALUES ... RETURNING id"""
+    result = await db.execute(insert(model).values(rows).returning(model.id))
+    return list(result.scalars())
+
+async def bulk_create(db: AsyncSession, model, schema: Type[BaseModel], items: List[Dict[str, Any]], mode: str) -> dict:
+    """Insert many rows with chunked multi-row INSERTs.
+
+    atomic:  any invalid row rejects the request (422); every chunk runs in
+             one transaction, so a database error inserts nothing.
+    partial: invalid rows are reported and skipped. Each chunk runs in a
+             savepoint; if one fails, its rows are retried one by one to
+             find and report the offending rows.
+    """
+    rows, errors = validate_rows(items, schema)
+    if mode == "atomic" and errors:
+        raise HTTPException(status_code=422, detail={"errors": errors})
+
+    ids: List[int] = []
+    chunks = [rows[start:start + BULK_CHUNK_SIZE] for start in range(0, len(rows), BULK_CHUNK_SIZE)]
+    try:
+        for chunk in chunks:
+            values = [row for _, row in chunk]
+            if mode == "atomic":
+                ids.extend(await insert_returning_ids(db, model, values))
+                continue
+            try:
+                async with db.begin_nested():
+                    ids.extend(await insert_returning_ids(db, model, values))
+            except DBAPIError:
+                for index, row in chunk:
+                    try:
+                        async with db.begin_nested():
+                            ids.extend(await insert_returning_ids(db, model, [row]))
+                    except DBAPIError as e:
+                        errors.append({"index": index, "error": str(e.orig)})
+        await db.commit()
+    except DBAPIError as e:
+        await db.rollback()
+        raise HTTPException(status_code=400, detail=f"Bulk insert failed: {e.orig}")
+
+    errors.sort(key=lambda error: error["index"])
+    return {"created": len(ids), "ids": ids, "errors": errors}
@@ -0,0 +1,353 @@
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+import logging
+import os
+import re
+
+from fastapi import HTTPException
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import AsyncSessionLocal
+from app.entity_search import search_entities, search_names, search_phone
+from app.intent_router import CREATE_PATTERN
+from app.models import Role, TableStat, User
+
+logger = logging.getLogger(__name__)
+
+DATA_QUERY_MAX_DAYS = int(os.getenv("DATA_QUERY_MAX_DAYS", "365"))
+DATA_QUERY_MAX_ROWS = int(os.getenv("DATA_QUERY_MAX_ROWS", "10"))
+DATA_QUERY_ENDPOINT = "/api/query"
+
+MODELS = {"users": User, "roles": Role}
+
+# Statement-level triggers with transition tables: a multi-row INSERT (bulk
+# create) updates the counter row once, not once per row
+TABLE_STATS_FUNCTIONS = [
+    """
+    CREATE OR REPLACE FUNCTION table_stats_after_insert() RETURNS trigger AS $$
+    BEGIN
+        INSERT INTO table_stats (table_name, row_count, last_created_at)
+        SELECT TG_TABLE_NAME, count(*), max(created_at) FROM new_rows
+        ON CONFLICT (table_name) DO UPDATE SET
+            row_count = table_stats.row_count + EXCLUDED.row_count,
+            last_created_at = GREATEST(table_stats.last_created_at, EXCLUDED.last_created_at);
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE OR REPLACE FUNCTION table_stats_after_delete() RETURNS trigger AS $$
+    BEGIN
+        UPDATE table_stats SET row_count = row_count - (SELECT count(*) FROM old_rows)
+        WHERE table_name = TG_TABLE_NAME;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE OR REPLACE FUNCTION table_stats_after_truncate() RETURNS trigger AS $$
+    BEGIN
+        UPDATE table_stats SET row_count = 0, last_created_at = NULL WHERE table_name = TG_TABLE_NAME;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+]
+
+TABLE_STATS_TRIGGERS = [
+    "CREATE TRIGGER {table}_stats_insert AFTER INSERT ON {table} REFERENCING NEW TABLE AS new_rows "
+    "FOR EACH STATEMENT EXECUTE FUNCTION table_stats_after_insert()",
+    "CREATE TRIGGER {table}_stats_delete AFTER DELETE ON {table} REFERENCING OLD TABLE AS old_rows "
+    "FOR EACH STATEMENT EXECUTE FUNCTION table_stats_after_delete()",
+    "CREATE TRIGGER {table}_stats_truncate AFTER TRUNCATE ON {table} "
+    "FOR EACH STATEMENT EXECUTE FUNCTION table_stats_after_truncate()",
+]
+
+def install_table_stats(engine):
+    """Create the table_stats triggers on users and roles, backfilling the counts once.
+
+    Only on Postgres; elsewhere count() falls back to COUNT(*).
+    """
+    if engine.dialect.name != "postgresql":
+        return
+    with engine.begin() as connection:
+        for ddl in TABLE_STATS_FUNCTIONS:
+            connection.exec_driver_sql(ddl)
+        for table in MODELS:
+            installed = connection.exec_driver_sql(
+                "SELECT 1 FROM pg_trigger WHERE tgname = %s", (f"{table}_stats_insert",)
+            ).first()
+            if installed:
+                continue
+            # Hold off writers so the backfilled count and the triggers start from the same rows
+            connection.exec_driver_sql(f"LOCK TABLE {table} IN SHARE ROW EXCLUSIVE MODE")
+            for ddl in TABLE_STATS_TRIGGERS:
+                connection.exec_driver_sql(ddl.format(table=table))
+            connection.exec_driver_sql(
+                f"INSERT INTO table_stats (table_name, row_count, last_created_at) "
+                f"SELECT %s, count(*), max(created_at) FROM {table} "
+                f"ON CONFLICT (table_name) DO UPDATE SET "
+                f"row_count = EXCLUDED.row_count, last_created_at = EXCLUDED.last_created_at",
+                (table,),
+            )
+            logger.info("Installed table_stats triggers on %s", table)
+
+def singular(resource: str) -> str:
+    return resource[:-1] if resource.endswith("s") else resource
+
+def noun(resource: str, count: int) -> str:
+    return resource if count != 1 else singular(resource)
+
+def describe_rows(resource: str, rows) -> str:
+    if resource == "users":
+        return ", ".join(f"{row['name']} ({row['phone_number']})" if row.get("phone_number") else row["name"] for row in rows)
+    return ", ".join(row["name"] for row in rows)
+
+def row_fields(model):
+    fields = [model.id, model.name, model.created_at]
+    if model is User:
+        fields.append(User.phone_number)
+    return fields
+
+async def run_count(db: AsyncSession, resource: str, params: dict) -> Tuple[Any, str]:
+    """Row count from the trigger-maintained counter, else COUNT(*)"""
+    count = (await db.execute(
+        select(TableStat.row_count).where(TableStat.table_name == resource)
+    )).scalar()
+    if count is None:
+        count = (await db.execute(select(func.count()).select_from(MODELS[resource]))).scalar()
+    verb = "is" if count == 1 else "are"
+    return count, f"There {verb} {count} {noun(resource, count)}."
+
+async def run_created_since(db: AsyncSession, resource: str, params: dict) -> Tuple[Any, str]:
+    """Rows created in the last N days, counted on the (created_at, id) index"""
+    model = MODELS[resource]
+    days = params["days"]
+    since = datetime.now(timezone.utc) - timedelta(days=days)
+    count = (await db.execute(select(func.count()).where(model.created_at >= since))).scalar()
+    window = "24 hours" if days == 1 else f"{days} days"
+    verb = "was" if count == 1 else "were"
+    return count, f"{count} {noun(resource, count)} {verb} created in the last {window}."
+
+async def run_latest(db: AsyncSession, resource: str, params: dict) -> Tuple[Any, str]:
+    """Newest rows by created_at, read off the (created_at, id) index"""
+    model = MODELS[resource]
+    rows = (await db.execute(
+        select(*row_fields(model)).order_by(model.created_at.desc(), model.id.desc()).limit(params["limit"])
+    )).mappings().all()
+    if not rows:
+        return [], f"There are no {resource} yet."
+    return [dict(row) for row in rows], f"Latest {noun(resource, len(rows))}: {describe_rows(resource, rows)}."
+
+async def run_find_by_name(db: AsyncSession, resource: str, params: dict) -> Tuple[Any, str]:
+    """Exact, prefix, then fuzzy (trigram) name matches"""
+    name = params["name"]
+    rows = await search_names(db, resource, name, DATA_QUERY_MAX_ROWS)
+    if not rows:
+        return [], f"No {singular(resource)} named '{name}'."
+    return rows, f"Found {len(rows)} {noun(resource, len(rows))} matching '{name}': {describe_rows(resource, rows)}."
+
+async def run_find_by_phone(db: AsyncSession, resource: str, params: dict) -> Tuple[Any, str]:
+    """Exact phone number, then numbers containing the digits"""
+    phone = params["phone_number"]
+    rows = await search_phone(db, phone, DATA_QUERY_MAX_ROWS)
+    if not rows:
+        return [], f"No user has phone number {phone}."
+    return rows, f"Phone number {phone} matches {describe_rows(resource, rows)}."
+
+async def run_search(db: AsyncSession, resource: str, params: dict) -> Tuple[Any, str]:
+    """Entity search: names, phone numbers, role descriptions and permissions"""
+    text = params["text"]
+    rows = await search_entities(db, text, (resource,), DATA_QUERY_MAX_ROWS)
+    if not rows:
+        return [], f"No {resource} match '{text}'."
+    return rows, f"{noun(resource, len(rows)).capitalize()} matching '{text}': {describe_rows(resource, rows)}."
+
+class DataQuery:
+    """One whitelisted, parameterized query over users or roles"""
+
+    def __init__(self, resources: Tuple[str, ...], params: Dict[str, Callable[[Any], Any]],
+                 run: Callable[[AsyncSession, str, dict], Awaitable[Tuple[Any, str]]]):
+        self.resources = resources
+        self.params = params
+        self.run = run
+
+def bounded_int(low: int, high: int) -> Callable[[Any], int]:
+    def parse(value: Any) -> int:
+        number = int(value)
+        if not low <= number <= high:
+            raise ValueError(f"must be between {low} and {high}")
+        return number
+    return parse
+
+def non_empty(value: Any) -> str:
+    text = str(value).strip()
+    if not text:
+        raise ValueError("must not be empty")
+    return text
+
+DATA_QUERIES: Dict[str, DataQuery] = {
+    "count": DataQuery(("users", "roles"), {}, run_count),
+    "created_since": DataQuery(("users", "roles"), {"days": bounded_int(1, DATA_QUERY_MAX_DAYS)}, run_created_since),
+    "latest": DataQuery(("users", "roles"), {"limit": bounded_int(1, DATA_QUERY_MAX_ROWS)}, run_latest),
+    "find_by_name": DataQuery(("users", "roles"), {"name": non_empty}, run_find_by_name),
+    "find_by_phone": DataQuery(("users",), {"phone_number": non_empty}, run_find_by_phone),
+    "search": DataQuery(("users", "roles"), {"text": non_empty}, run_search),
+}
+
+def validate_query(name: str, data: Optional[dict]) -> Tuple[DataQuery, str, dict]:
+    """Check a query name and its parameters against the whitelist: (query, resource, params)"""
+    query = DATA_QUERIES.get(name)
+    if query is None:
+        raise HTTPException(status_code=404, detail=f"Unknown query; one of {sorted(DATA_QUERIES)}")
+    data = dict(data or {})
+    resource = data.pop("resource", query.resources[0] if len(query.resources) == 1 else None)
+    if resource not in query.resources:
+        raise HTTPException(status_code=400, detail=f"resource must be one of {list(query.resources)}")
+    params = {}
+    for param, parse in query.params.items():
+        if param not in data:
+            raise HTTPException(status_code=400, detail=f"Missing parameter: {param}")
+        try:
+            params[param] = parse(data[param])
+        except (TypeError, ValueError) as e:
+            raise HTTPException(status_code=400, detail=f"Invalid {param}: {e}")
+    return query, resource, params
+
+async def run_data_query(db: AsyncSession, name: str, data: Optional[dict]) -> dict:
+    """Run a whitelisted query: {"query", "resource", "params", "result", "message"}"""
+    query, resource, params = validate_query(name, data)
+    result, message = await query.run(db, resource, params)
+    return {"query": name, "resource": resource, "params": params, "result": result, "message": message}
+
+def query_endpoint(name: str) -> str:
+    return f"{DATA_QUERY_ENDPOINT}/{name}"
+
+def query_name(api_call: Optional[dict]) -> Optional[str]:
+    """The query name of a "query" action's api_call, or None if it is not one"""
+    endpoint = str((api_call or {}).get("endpoint") or "")
+    prefix = f"{DATA_QUERY_ENDPOINT}/"
+    return endpoint[len(prefix):] if endpoint.startswith(prefix) else None
+
+def check_query_call(api_call: Optional[dict]) -> Optional[str]:
+    """Why a "query" action's api_call is not runnable, or None"""
+    name = query_name(api_call)
+    if name not in DATA_QUERIES:
+        return "unknown_endpoint"
+    try:
+        validate_query(name, api_call.get("data"))
+    except HTTPException:
+        return "incomplete_api_call"
+    return None
+
+COUNT_PATTERN = re.compile(r"\b(how many|number of|count|total)\b", re.IGNORECASE)
+LATEST_PATTERN = re.compile(
+    r"\b(latest|newest|most recent(?:ly)?|recently (?:created|added))\b(?:\s+(\d+))?", re.IGNORECASE
+)
+LAST_N_PATTERN = re.compile(r"\blast\s+(\d+)\s+(?:users?|roles?)\b", re.IGNORECASE)
+WINDOW_PATTERNS = [
+    (re.compile(r"\b(?:last|past)\s+(\d+)\s+days?\b", re.IGNORECASE), 1),
+    (re.compile(r"\b(?:last|past)\s+(\d+)\s+weeks?\b", re.IGNORECASE), 7),
+    (re.compile(r"\b(?:last|past)\s+(\d+)\s+months?\b", re.IGNORECASE), 30),
+]
+WINDOW_WORDS = [
+    (re.compile(r"\btoday\b|\b(?:last|past)\s+24\s+hours\b", re.IGNORECASE), 1),
+    (re.compile(r"\b(?:this|last|past)\s+week\b", re.IGNORECASE), 7),
+    (re.compile(r"\b(?:this|last|past)\s+month\b", re.IGNORECASE), 30),
+    (re.compile(r"\b(?:this|last|past)\s+year\b", re.IGNORECASE), 365),
+]
+CREATED_PATTERN = re.compile(r"\b(created|added|new|joined|registered)\b", re.IGNORECASE)
+LOOKUP_PATTERN = re.compile(r"\b(who|whose|which|find|look ?up|search|is there|do we have|any)\b", re.IGNORECASE)
+LOOKUP_NAME_PATTERN = re.compile(r"\b(?:named|called)\s+['\"]?([\w.'-]+)", re.IGNORECASE)
+LOOKUP_PHONE_PATTERN = re.compile(r"\b(?:phone(?:\s+number)?|number)\s+(\+?\d{3,})", re.IGNORECASE)
+RECORD_PATTERN = re.compile(
+    r"\b(?:open|show|view|find|get)\s+(?:me\s+)?([\w.-]+(?:\s+[\w.-]+)?)'s\s+(?:record|profile|details|info|entry)\b",
+    re.IGNORECASE,
+)
+PERMISSION_PATTERN = re.compile(
+    r"\broles?\b.*\b(?:has|have|with|grants?|gives?|includes?|allows?)\s+(?:the\s+)?['\"]?([\w:-]+)['\"]?\s+permissions?\b",
+    re.IGNORECASE,
+)
+RESOURCE_PATTERNS = {resource: re.compile(rf"\b{singular(resource)}s?\b", re.IGNORECASE) for resource in MODELS}
+
+def time_window(query: str) -> Optional[int]:
+    for pattern, unit in WINDOW_PATTERNS:
+        match = pattern.search(query)
+        if match:
+            return int(match.group(1)) * unit
+    for pattern, days in WINDOW_WORDS:
+        if pattern.search(query):
+            return days
+    return None
+
+def match_data_query(query: str) -> Optional[Tuple[str, dict]]:
+    """Map a question about the data to a whitelisted query: (name, data) or None.
+
+    Only unambiguous phrasings match ("how many users", "roles created this
+    week", "latest 3 users", "find user named John", "open John's record",
+    "who has phone 555123", "which role has delete permission"); anything
+    else is left to the LLM.
+    """
+    resources = [resource for resource, pattern in RESOURCE_PATTERNS.items() if pattern.search(query)]
+    # "create user named John ..." also carries a name and a phone number
+    lookup = LOOKUP_PATTERN.search(query) and not CREATE_PATTERN.search(query)
+
+    phone = LOOKUP_PHONE_PATTERN.search(query)
+    if phone and lookup and resources in ([], ["users"]):
+        return "find_by_phone", {"resource": "users", "phone_number": phone.group(1)}
+
+    record = RECORD_PATTERN.search(query)
+    if record and not CREATE_PATTERN.search(query) and len(resources) <= 1:
+        return "find_by_name", {"resource": resources[0] if resources else "users", "name": record.group(1)}
+
+    if len(resources) != 1:
+        return None
+    resource = resources[0]
+
+    permission = PERMISSION_PATTERN.search(query)
+    if permission and resource == "roles" and not CREATE_PATTERN.search(query):
+        return "search", {"resource": "roles", "text": permission.group(1)}
+
+    name = LOOKUP_NAME_PATTERN.search(query)
+    if name and lookup:
+        return "find_by_name", {"resource": resource, "name": name.group(1)}
+
+    days = time_window(query)
+    if days is not None and (COUNT_PATTERN.search(query) or CREATED_PATTERN.search(query)):
+        return "created_since", {"resource": resource, "days": min(days, DATA_QUERY_MAX_DAYS)}
+    if COUNT_PATTERN.search(query):
+        return "count", {"resource": resource}
+
+    latest = LATEST_PATTERN.search(query) or LAST_N_PATTERN.search(query)
+    if latest:
+        number = next((group for group in latest.groups() if group and group.isdigit()), None)
+        limit = min(int(number), DATA_QUERY_MAX_ROWS) if number else 5
+        return "latest", {"resource": resource, "limit": max(limit, 1)}
+    return None
+
+def query_action(name: str, data: dict, message: str) -> dict:
+    """A chat action of type "query" for a whitelisted query"""
+    return {
+        "action_type": "query",
+        "target_page": data.get("resource"),
+        "route": None,
+        "api_call": {"method": "GET", "endpoint": query_endpoint(name), "data": data},
+        "message": message,
+    }
+
+async def answer_query_action(action: dict) -> dict:
+    """Run a "query" action's whitelisted query and put the answer in its message"""
+    if action.get("action_type") != "query":
+        return action
+    api_call = action.get("api_call") or {}
+    try:
+        async with AsyncSessionLocal() as db:
+            answer = await run_data_query(db, query_name(api_call), api_call.get("data"))
+    except HTTPException as e:
+        logger.info("Rejected data query %s: %s", api_call.get("endpoint"), e.detail)
+        return {"action_type": "general", "message": "Sorry, I can't answer that question about the data."}
+    except Exception as e:
+        logger.warning("Data query %s failed: %r", api_call.get("endpoint"), e)
+        return {"action_type": "general", "message": "Sorry, I can't look that up right now. Please try again."}
+    return {**action, "target_page": answer["resource"], "message": answer["message"]}
@@ -0,0 +1,141 @@
+from abc import ABC, abstractmethod
+from typing import List
+import argparse
+import os
+
+import numpy as np
+
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "sentence-transformers")
+EMBEDDING_MODEL_NAME = os.getenv("EMBEDDING_MODEL_NAME", "sentence-transformers/all-MiniLM-L6-v2")
+ONNX_MODEL_DIR = os.getenv("ONNX_MODEL_DIR", "/app/models/all-MiniLM-L6-v2-onnx")
+ONNX_MODEL_FILE = os.getenv("ONNX_MODEL_FILE", "model_quantized.onnx")
+ONNX_NUM_THREADS = int(os.getenv("ONNX_NUM_THREADS", "0"))  # 0 lets onnxruntime decide
+
+EMBEDDING_DIMENSION = 384
+MAX_SEQ_LENGTH = 256  # all-MiniLM-L6-v2's max_seq_length
+
+class EmbeddingBackend(ABC):
+    """Turns texts into L2-normalized EMBEDDING_DIMENSION vectors"""
+
+    name = "base"
+    dimension = EMBEDDING_DIMENSION
+
+    @abstractmethod
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """One vector per text, shape (len(texts), dimension)"""
+
+class SentenceTransformerBackend(EmbeddingBackend):
+    """The reference PyTorch model"""
+
+    name = "sentence-transformers"
+
+    def __init__(self, model_name: str = EMBEDDING_MODEL_NAME):
+        from sentence_transformers import SentenceTransformer
+        self.model = SentenceTransformer(model_name)
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        return self.model.encode(texts, batch_size=len(texts))
+
+class OnnxBackend(EmbeddingBackend):
+    """int8-quantized ONNX export of the same model, run on onnxruntime.
+
+    Reproduces the sentence-transformers pipeline (mean pooling over the
+    attention mask, then L2 normalization), so its vectors can be searched
+    against the existing 384-dim COSINE collection. Create the model
+    directory with `python -m app.embedding_backends export`.
+    """
+
+    name = "onnx"
+
+    def __init__(self, model_dir: str = ONNX_MODEL_DIR, model_file: str = ONNX_MODEL_FILE):
+        try:
+            import onnxruntime
+            from tokenizers import Tokenizer
+        except ImportError as e:
+            raise RuntimeError(
+                "EMBEDDING_BACKEND=onnx needs onnxruntime and tokenizers "
+                "(pip install -r requirements-onnx.txt)"
+            ) from e
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=MAX_SEQ_LENGTH)
+        self.tokenizer.enable_padding()
+
+        options = onnxruntime.SessionOptions()
+        if ONNX_NUM_THREADS:
+            options.intra_op_num_threads = ONNX_NUM_THREADS
+        self.session = onnxruntime.InferenceSession(
+            os.path.join(model_dir, model_file),
+            sess_options=options,
+            providers=["CPUExecutionProvider"],
+        )
+        self.input_names = {model_input.name for model_input in self.session.get_inputs()}
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        encodings = self.tokenizer.encode_batch(texts)
+        input_ids = np.array([encoding.ids for encoding in encodings], dtype=np.int64)
+        attention_mask = np.array([encoding.attention_mask for encoding in encodings], dtype=np.int64)
+        feeds = {
+            "input_ids": input_ids,
+            "attention_mask": attention_mask,
+            "token_type_ids": np.zeros_like(input_ids),
+        }
+        token_embeddings = self.session.run(
+            None, {name: value for name, value in feeds.items() if name in self.input_names}
+        )[0]
+
+        mask = attention_mask[..., None].astype(np.float32)
+        pooled = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        norms = np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+        return pooled / norms
+
+BACKENDS = {
+    SentenceTransformerBackend.name: SentenceTransformerBackend,
+    OnnxBackend.name: OnnxBackend,
+}
+
+def create_backend(name: str = EMBEDDING_BACKEND) -> EmbeddingBackend:
+    """Instantiate the embedding backend selected by EMBEDDING_BACKEND"""
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown EMBEDDING_BACKEND {name!r}, expected one of {sorted(BACKENDS)}")
+    return BACKENDS[name]()
+
+def export_onnx(output_dir: str, model_name: str = EMBEDDING_MODEL_NAME):
+    """Export the transformer to ONNX and write an int8 dynamically quantized copy"""
+    import torch
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    from transformers import AutoModel, AutoTokenizer
+
+    os.makedirs(output_dir, exist_ok=True)
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = AutoModel.from_pretrained(model_name).eval()
+    tokenizer.save_pretrained(output_dir)
+
+    sample = tokenizer(["export sample"], return_tensors="pt")
+    dynamic_axes = {"input_ids": {0: "batch", 1: "sequence"},
+                    "attention_mask": {0: "batch", 1: "sequence"},
+                    "token_type_ids": {0: "batch", 1: "sequence"},
+                    "last_hidden_state": {0: "batch", 1: "sequence"}}
+    float_path = os.path.join(output_dir, "model.onnx")
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            (sample["input_ids"], sample["attention_mask"], sample["token_type_ids"]),
+            float_path,
+            input_names=["input_ids", "attention_mask", "token_type_ids"],
+            output_names=["last_hidden_state"],
+            dynamic_axes=dynamic_axes,
+            opset_version=14,
+        )
+
+    quantize_dynamic(float_path, os.path.join(output_dir, "model_quantized.onnx"), weight_type=QuantType.QInt8)
+    print(f"Exported {model_name} to {output_dir}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Embedding backend tools")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    export_parser = subcommands.add_parser("export", help="export an int8 ONNX model for EMBEDDING_BACKEND=onnx")
+    export_parser.add_argument("--output", default=ONNX_MODEL_DIR)
+    export_parser.add_argument("--model", default=EMBEDDING_MODEL_NAME)
+    args = parser.parse_args()
+    export_onnx(args.output, args.model)
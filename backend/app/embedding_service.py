@@ -0,0 +1,101 @@
+from collections import OrderedDict
+from concurrent.futures import Executor
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+import asyncio
+import os
+
+EMBED_BATCH_WINDOW_MS = float(os.getenv("EMBED_BATCH_WINDOW_MS", "5"))
+EMBED_MAX_BATCH = int(os.getenv("EMBED_MAX_BATCH", "32"))
+EMBED_CACHE_SIZE = int(os.getenv("EMBED_CACHE_SIZE", "1024"))
+
+class EmbeddingService:
+    """Coalesces concurrent encode requests into batched forward passes.
+
+    embed() queues the text and waits. The queue is flushed as one batch
+    once it reaches max_batch or window_ms after the first queued text,
+    whichever comes first. Identical texts in flight share one slot, and
+    recent results are kept in an LRU cache.
+    """
+
+    def __init__(self, encode: Callable[[List[str]], Sequence], executor: Executor,
+                 window_ms: float = EMBED_BATCH_WINDOW_MS, max_batch: int = EMBED_MAX_BATCH,
+                 cache_size: int = EMBED_CACHE_SIZE):
+        self.encode = encode
+        self.executor = executor
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._pending: List[Tuple[str, asyncio.Future]] = []
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self.cache_hits = 0
+        self.encoded = 0
+        self.batches = 0
+
+    async def embed(self, text: str) -> List[float]:
+        """Return the embedding for one text"""
+        cached = self._cache.get(text)
+        if cached is not None:
+            self._cache.move_to_end(text)
+            self.cache_hits += 1
+            return cached
+
+        future = self._inflight.get(text)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+            self._inflight[text] = future
+            self._pending.append((text, future))
+            if len(self._pending) >= self.max_batch:
+                self._flush()
+            elif self._timer is None:
+                self._timer = loop.call_later(self.window, self._flush)
+        # shield: one caller being cancelled must not cancel the shared result
+        return await asyncio.shield(future)
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        while self._pending:
+            batch, self._pending = self._pending[:self.max_batch], self._pending[self.max_batch:]
+            asyncio.ensure_future(self._run_batch(batch))
+
+    async def _run_batch(self, batch: List[Tuple[str, asyncio.Future]]):
+        texts = [text for text, _ in batch]
+        loop = asyncio.get_running_loop()
+        try:
+            vectors = await loop.run_in_executor(self.executor, self.encode, texts)
+        except Exception as e:
+            for text, future in batch:
+                self._inflight.pop(text, None)
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        self.batches += 1
+        self.encoded += len(texts)
+        for (text, future), vector in zip(batch, vectors):
+            embedding = vector.tolist()
+            self._inflight.pop(text, None)
+            self._remember(text, embedding)
+            if not future.done():
+                future.set_result(embedding)
+
+    def _remember(self, text: str, embedding: List[float]):
+        if self.cache_size <= 0:
+            return
+        self._cache[text] = embedding
+        self._cache.move_to_end(text)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def stats(self) -> dict:
+        return {
+            "cache_entries": len(self._cache),
+            "cache_hits": self.cache_hits,
+            "encoded": self.encoded,
+            "batches": self.batches,
+            "mean_batch_size": self.encoded / self.batches if self.batches else 0.0,
+        }
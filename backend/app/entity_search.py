@@ -0,0 +1,307 @@
+from typing import Iterable, List, Optional, Sequence
+import logging
+import os
+import re
+import uuid
+
+from qdrant_client.http.models import (
+    Direction, Distance, FieldCondition, Filter, MatchAny, MatchValue, OrderBy, PayloadSchemaType, PointStruct, VectorParams
+)
+from sqlalchemy import Float, String, cast, func, literal_column, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import SessionLocal, leader_lock
+from app.embedding_backends import EMBEDDING_BACKEND, EMBEDDING_DIMENSION
+from app.health import qdrant_breaker
+from app.models import Role, User
+from app.pagination import prefix_filter
+from app.qdrant_handler import embed_query, encode_batch, get_async_client, get_client
+
+logger = logging.getLogger(__name__)
+
+ENTITY_SEARCH_LIMIT = int(os.getenv("ENTITY_SEARCH_LIMIT", "5"))
+# Optional semantic matching over a Qdrant collection of users and roles
+ENTITY_SEMANTIC_SEARCH = os.getenv("ENTITY_SEMANTIC_SEARCH", "0") == "1"
+ENTITY_COLLECTION_NAME = "dashboard_entities"
+ENTITY_INDEX_BATCH_SIZE = int(os.getenv("ENTITY_INDEX_BATCH_SIZE", "256"))
+
+MODELS = {"users": User, "roles": Role}
+
+# The role text searched by full-text queries. The query repeats this exact
+# expression so the planner can use the expression index.
+ROLE_DOCUMENT = (
+    "to_tsvector('simple', coalesce(roles.name, '') || ' ' || coalesce(roles.description, '') "
+    "|| ' ' || coalesce(roles.permissions::text, ''))"
+)
+
+# Names get pg_trgm GiST indexes: besides the similarity filter (%) they
+# return rows nearest first (ORDER BY lower(name) <-> :q LIMIT n), so a
+# common name never sorts every candidate. Phone numbers only need
+# LIKE '%...%', which a GIN index serves. Postgres keeps them current on
+# every insert; nothing is rebuilt.
+ENTITY_SEARCH_DDL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS ix_users_name_trgm_gist ON users USING gist (lower(name) gist_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_users_phone_trgm ON users USING gin (phone_number gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_roles_name_trgm_gist ON roles USING gist (lower(name) gist_trgm_ops)",
+    f"CREATE INDEX IF NOT EXISTS ix_roles_document ON roles USING gin ({ROLE_DOCUMENT})",
+]
+
+PHONE_PATTERN = re.compile(r"^\+?\d{3,}$")
+
+_trigram_available: Optional[bool] = None
+
+def install_entity_search(engine):
+    """Create pg_trgm and the trigram/full-text indexes (Postgres only; a no-op once they exist)"""
+    if engine.dialect.name != "postgresql":
+        return
+    try:
+        with engine.begin() as connection:
+            for ddl in ENTITY_SEARCH_DDL:
+                connection.exec_driver_sql(ddl)
+    except Exception as e:
+        logger.warning("Entity search indexes not installed, falling back to LIKE scans: %r", e)
+
+async def trigram_available(db: AsyncSession) -> bool:
+    """Whether pg_trgm is installed; checked once per process"""
+    global _trigram_available
+    if _trigram_available is None:
+        if db.bind.dialect.name != "postgresql":
+            _trigram_available = False
+        else:
+            found = await db.execute(text("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'"))
+            _trigram_available = found.first() is not None
+    return _trigram_available
+
+def entity_fields(model):
+    fields = [model.id, model.name]
+    if model is User:
+        fields += [User.phone_number, User.email]
+    else:
+        fields += [Role.description, Role.permissions]
+    return fields
+
+def matches(resource: str, rows, match: str, scores: Optional[Sequence[float]] = None) -> List[dict]:
+    return [
+        {**dict(row), "resource": resource, "match": match, "score": round(float(score), 3)}
+        for row, score in zip(rows, scores if scores is not None else [1.0] * len(rows))
+    ]
+
+def merge(found: List[dict], more: Iterable[dict], limit: int) -> List[dict]:
+    """Append matches not already found (by resource and id), up to limit"""
+    seen = {(match["resource"], match["id"]) for match in found}
+    for match in more:
+        if len(found) >= limit:
+            break
+        if (match["resource"], match["id"]) not in seen:
+            seen.add((match["resource"], match["id"]))
+            found.append(match)
+    return found
+
+async def search_names(db: AsyncSession, resource: str, name: str, limit: int = ENTITY_SEARCH_LIMIT) -> List[dict]:
+    """Exact, then prefix name matches (lower(name) btree), then the nearest fuzzy ones (trigram GiST)"""
+    model = MODELS[resource]
+    fields = entity_fields(model)
+    lowered = func.lower(model.name)
+    # Lookups are unordered so the planner reads the name index, not the primary key
+    exact = (await db.execute(select(*fields).where(lowered == name.lower()).limit(limit))).mappings().all()
+    found = matches(resource, sorted(exact, key=lambda row: row["id"]), "exact")
+    if len(found) < limit:
+        # Shorter names are closer matches
+        rows = (await db.execute(select(*fields).where(prefix_filter(model.name, name)).limit(limit))).mappings().all()
+        rows = sorted(rows, key=lambda row: (len(row["name"]), row["id"]))
+        merge(found, matches(resource, rows, "prefix", [0.9] * len(rows)), limit)
+    if len(found) >= limit:
+        return found
+
+    if await trigram_available(db):
+        # KNN: ordered by the distance operator alone so the index returns rows nearest first
+        distance = lowered.op("<->", return_type=Float)(name.lower())
+        rows = (await db.execute(
+            select(*fields, distance.label("distance"))
+            .where(lowered.op("%")(name.lower()))
+            .order_by(distance)
+            .limit(limit)
+        )).mappings().all()
+        scores = [1 - row["distance"] for row in rows]
+        rows = [{key: value for key, value in row.items() if key != "distance"} for row in rows]
+    else:
+        rows = (await db.execute(
+            select(*fields).where(lowered.contains(name.lower(), autoescape=True)).order_by(model.id).limit(limit)
+        )).mappings().all()
+        scores = [0.5] * len(rows)
+    return merge(found, matches(resource, rows, "fuzzy", scores), limit)
+
+async def search_phone(db: AsyncSession, phone: str, limit: int = ENTITY_SEARCH_LIMIT) -> List[dict]:
+    """Exact phone number first (btree), then numbers containing the digits (trigram index)"""
+    fields = entity_fields(User)
+    rows = (await db.execute(select(*fields).where(User.phone_number == phone).limit(limit))).mappings().all()
+    found = matches("users", sorted(rows, key=lambda row: row["id"]), "exact")
+    if len(found) < limit:
+        rows = (await db.execute(
+            select(*fields).where(User.phone_number.contains(phone, autoescape=True)).limit(limit)
+        )).mappings().all()
+        rows = sorted(rows, key=lambda row: (len(row["phone_number"]), row["id"]))
+        found = merge(found, matches("users", rows, "partial", [0.5] * len(rows)), limit)
+    return found
+
+async def search_role_text(db: AsyncSession, words: str, limit: int = ENTITY_SEARCH_LIMIT) -> List[dict]:
+    """Roles whose name, description or permissions contain all the words (full-text index)"""
+    fields = entity_fields(Role)
+    if db.bind.dialect.name == "postgresql":
+        document = literal_column(ROLE_DOCUMENT)
+        query = func.plainto_tsquery(literal_column("'simple'"), words)
+        rank = func.ts_rank(document, query)
+        rows = (await db.execute(
+            select(*fields, rank.label("rank")).where(document.op("@@")(query)).order_by(rank.desc(), Role.id).limit(limit)
+        )).mappings().all()
+        return matches("roles", [{k: v for k, v in row.items() if k != "rank"} for row in rows], "text",
+                       [row["rank"] for row in rows])
+    conditions = []
+    for word in words.lower().split():
+        conditions.append(
+            func.lower(Role.name).contains(word, autoescape=True)
+            | func.lower(func.coalesce(Role.description, "")).contains(word, autoescape=True)
+            | func.lower(func.coalesce(cast(Role.permissions, String), "")).contains(word, autoescape=True)
+        )
+    rows = (await db.execute(select(*fields).where(*conditions).order_by(Role.id).limit(limit))).mappings().all()
+    return matches("roles", rows, "text", [0.5] * len(rows))
+
+async def search_entities(db: AsyncSession, query: str, resources: Sequence[str] = ("users", "roles"),
+                          limit: int = ENTITY_SEARCH_LIMIT) -> List[dict]:
+    """Resolve free text to users and roles: phone numbers, names, role text, then (optionally) semantics"""
+    query = query.strip()
+    if not query:
+        return []
+    found: List[dict] = []
+    if "users" in resources and PHONE_PATTERN.match(query.replace(" ", "").replace("-", "")):
+        merge(found, await search_phone(db, query.replace(" ", "").replace("-", ""), limit), limit)
+    for resource in resources:
+        merge(found, await search_names(db, resource, query, limit), limit)
+    if "roles" in resources and len(found) < limit:
+        merge(found, await search_role_text(db, query, limit), limit)
+    if ENTITY_SEMANTIC_SEARCH and len(found) < limit:
+        merge(found, await search_semantic(query, resources, limit), limit)
+    return found
+
+def entity_point_id(resource: str, row_id: int) -> str:
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f"{resource}/{row_id}"))
+
+def entity_text(resource: str, row) -> str:
+    """Text that is embedded for a user or role"""
+    if resource == "users":
+        return f"user {row.name}, phone {row.phone_number}, email {row.email or '-'}"
+    permissions = ", ".join(row.permissions or [])
+    return f"role {row.name}: {row.description or ''}. Permissions: {permissions}"
+
+def index_entity_ids(resource: str, ids: Sequence[int]):
+    """Embed and upsert just-created users or roles into the entity collection"""
+    model = MODELS[resource]
+    try:
+        for start in range(0, len(ids), ENTITY_INDEX_BATCH_SIZE):
+            with SessionLocal() as db:
+                rows = db.query(model).filter(model.id.in_(ids[start:start + ENTITY_INDEX_BATCH_SIZE])).all()
+            index_entities(resource, rows)
+    except Exception as e:
+        logger.error("Error indexing %d %s: %r", len(ids), resource, e)
+
+def index_entities(resource: str, rows: Iterable):
+    """Embed and upsert users or roles into the entity collection"""
+    rows = list(rows)
+    for start in range(0, len(rows), ENTITY_INDEX_BATCH_SIZE):
+        batch = rows[start:start + ENTITY_INDEX_BATCH_SIZE]
+        embeddings = encode_batch([entity_text(resource, row) for row in batch])
+        get_client().upsert(
+            collection_name=ENTITY_COLLECTION_NAME,
+            points=[
+                PointStruct(id=entity_point_id(resource, row.id), vector=embedding.tolist(),
+                            payload={"resource": resource, "id": row.id, "name": row.name,
+                                     "backend": EMBEDDING_BACKEND})
+                for row, embedding in zip(batch, embeddings)
+            ],
+        )
+
+def initialize_entity_index():
+    """Create the entity collection on first boot and embed the rows it is missing.
+
+    Rows are embedded in id order, so each boot resumes after the highest
+    id already indexed: a fill that stopped halfway, or rows created while
+    ENTITY_SEMANTIC_SEARCH was off, are caught up. Rows are only
+    re-embedded when EMBEDDING_BACKEND changed (every point records its
+    backend), since vectors of different models cannot be compared. Only
+    one worker does it; the others skip.
+    """
+    with leader_lock("entity_index", wait=False) as leader:
+        if leader:
+            fill_entity_index()
+
+def highest_indexed_id(resource: str) -> int:
+    """Largest row id of a resource in the entity collection, 0 when it has none"""
+    points, _ = get_client().scroll(
+        collection_name=ENTITY_COLLECTION_NAME,
+        scroll_filter=Filter(must=[FieldCondition(key="resource", match=MatchValue(value=resource))]),
+        order_by=OrderBy(key="id", direction=Direction.DESC),
+        limit=1,
+        with_payload=True,
+    )
+    return points[0].payload["id"] if points else 0
+
+def embedded_by_other_backend() -> bool:
+    """Whether any point of the entity collection was embedded by another EMBEDDING_BACKEND"""
+    points, _ = get_client().scroll(
+        collection_name=ENTITY_COLLECTION_NAME,
+        scroll_filter=Filter(must_not=[FieldCondition(key="backend", match=MatchValue(value=EMBEDDING_BACKEND))]),
+        limit=1,
+    )
+    return bool(points)
+
+def fill_entity_index():
+    try:
+        collections = get_client().get_collections().collections
+        exists = any(col.name == ENTITY_COLLECTION_NAME for col in collections)
+        if exists and embedded_by_other_backend():
+            logger.info("Rebuilding %s: embedded by another backend than %s", ENTITY_COLLECTION_NAME, EMBEDDING_BACKEND)
+            get_client().delete_collection(ENTITY_COLLECTION_NAME)
+            exists = False
+        if not exists:
+            get_client().create_collection(
+                collection_name=ENTITY_COLLECTION_NAME,
+                vectors_config=VectorParams(size=EMBEDDING_DIMENSION, distance=Distance.COSINE),
+            )
+            logger.info("Created Qdrant collection: %s", ENTITY_COLLECTION_NAME)
+        # Needed by the ordered scroll in highest_indexed_id; a no-op once it exists
+        get_client().create_payload_index(ENTITY_COLLECTION_NAME, "id", PayloadSchemaType.INTEGER)
+        for resource, model in MODELS.items():
+            last_id = first_id = highest_indexed_id(resource)
+            while True:
+                with SessionLocal() as db:
+                    rows = db.query(model).filter(model.id > last_id).order_by(model.id).limit(ENTITY_INDEX_BATCH_SIZE).all()
+                if not rows:
+                    break
+                index_entities(resource, rows)
+                last_id = rows[-1].id
+            if last_id > first_id:
+                logger.info("Indexed %s after id %d up to id %d", resource, first_id, last_id)
+    except Exception as e:
+        logger.error("Entity index initialization failed, semantic entity search disabled: %r", e)
+
+async def search_semantic(query: str, resources: Sequence[str], limit: int) -> List[dict]:
+    """Nearest users/roles in the entity collection; empty when Qdrant is unavailable"""
+    if not qdrant_breaker.allow_request():
+        return []
+    try:
+        points = (await get_async_client().query_points(
+            collection_name=ENTITY_COLLECTION_NAME,
+            query=await embed_query(query),
+            query_filter=Filter(must=[FieldCondition(key="resource", match=MatchAny(any=list(resources)))]),
+            limit=limit,
+            with_payload=True,
+        )).points
+    except Exception as e:
+        logger.warning("Semantic entity search failed: %r", e)
+        return []
+    return [
+        {"resource": point.payload["resource"], "id": point.payload["id"], "name": point.payload["name"],
+         "match": "semantic", "score": round(point.score, 3)}
+        for point in points
+    ]
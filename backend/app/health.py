@@ -0,0 +1,124 @@
+from typing import Awaitable, Callable, Dict, Optional
+import asyncio
+import logging
+import os
+import time
+
+from app.metrics import PROBE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+HEALTH_CHECK_INTERVAL = float(os.getenv("HEALTH_CHECK_INTERVAL", "10"))
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "3"))
+CIRCUIT_RESET_TIMEOUT = float(os.getenv("CIRCUIT_RESET_TIMEOUT", "30"))
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+class CircuitBreaker:
+    """In-memory availability state for one dependency.
+
+    Request handlers call allow_request() instead of probing the service
+    themselves. The breaker opens after CIRCUIT_FAILURE_THRESHOLD request
+    failures in a row, or immediately when a background probe fails. It
+    closes again on the next successful probe; after CIRCUIT_RESET_TIMEOUT
+    without one it lets a single trial request through (half-open).
+    """
+
+    def __init__(self, name: str, failure_threshold: int = CIRCUIT_FAILURE_THRESHOLD,
+                 reset_timeout: float = CIRCUIT_RESET_TIMEOUT):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.last_error: Optional[str] = None
+        self.last_checked: Optional[float] = None
+
+    def allow_request(self) -> bool:
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+            self.state = HALF_OPEN
+            return True
+        return False
+
+    def record_success(self):
+        self.state = CLOSED
+        self.failures = 0
+        self.last_error = None
+
+    def record_failure(self, error: Optional[BaseException] = None):
+        self.failures += 1
+        self.last_error = repr(error) if error is not None else None
+        if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+            self.trip()
+
+    def trip(self):
+        """Open the breaker right away"""
+        self.state = OPEN
+        self.opened_at = time.monotonic()
+
+    def snapshot(self) -> dict:
+        return {
+            "state": self.state,
+            "failures": self.failures,
+            "last_error": self.last_error,
+            "seconds_since_check": time.monotonic() - self.last_checked if self.last_checked else None,
+        }
+
+qdrant_breaker = CircuitBreaker("qdrant")
+ollama_breaker = CircuitBreaker("ollama")
+
+class HealthMonitor:
+    """Periodically probes dependencies off the request path and updates their breakers"""
+
+    def __init__(self, interval: float = HEALTH_CHECK_INTERVAL):
+        self.interval = interval
+        self._probes: Dict[str, tuple] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def register(self, breaker: CircuitBreaker, probe: Callable[[], Awaitable[None]]):
+        """Register a probe coroutine that raises when the dependency is unusable"""
+        self._probes[breaker.name] = (breaker, probe)
+
+    async def check_all(self):
+        await asyncio.gather(*(self._check(breaker, probe) for breaker, probe in self._probes.values()))
+
+    async def _check(self, breaker: CircuitBreaker, probe):
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(probe(), timeout=self.interval)
+            breaker.record_success()
+        except Exception as e:
+            if breaker.state != OPEN:
+                logger.warning("%s health check failed, marking it down: %r", breaker.name, e)
+            breaker.last_error = repr(e)
+            breaker.trip()
+        PROBE_SECONDS.labels(breaker.name).observe(time.perf_counter() - started)
+        breaker.last_checked = time.monotonic()
+
+    async def _run(self):
+        while True:
+            await self.check_all()
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def status(self) -> dict:
+        return {name: breaker.snapshot() for name, (breaker, _) in self._probes.items()}
+
+health_monitor = HealthMonitor()
@@ -0,0 +1,158 @@
+from typing import Iterable, List, Optional, Tuple
+import os
+import re
+
+from app.schema import RoleCreate, UserCreate
+
+FAST_PATH_MIN_CONFIDENCE = float(os.getenv("FAST_PATH_MIN_CONFIDENCE", "0.85"))
+
+NAVIGATE_PATTERN = re.compile(r"\b(show|view|see|list|go|open|take me|display|navigate|browse)\b", re.IGNORECASE)
+CREATE_PATTERN = re.compile(r"\b(create|add|new|register|make)\b", re.IGNORECASE)
+# Questions about the data ("how many users") are not page actions
+QUESTION_PATTERN = re.compile(r"\?|\b(how|what|which|who|why|when|count)\b", re.IGNORECASE)
+
+NAME_PATTERN = re.compile(
+    r"\b(?:name[ds]?|called)\s+(.+?)(?=\s+(?:and|with|phone|email)\b|\s*$)", re.IGNORECASE
+)
+PHONE_PATTERN = re.compile(r"\bphone(?:\s+number)?\s+(\+?\d+)", re.IGNORECASE)
+EMAIL_PATTERN = re.compile(r"[\w.+-]+@[\w-]+\.[\w.-]+")
+PERMISSIONS_PATTERN = re.compile(
+    r"\bpermissions?\s+(.+?)(?=\s+(?:with|and\s+description)\b|\s*$)", re.IGNORECASE
+)
+DESCRIPTION_PATTERN = re.compile(r"\bdescription\s+['\"]?(.+?)['\"]?\s*$", re.IGNORECASE)
+
+# Fields a create must carry to pass its endpoint's validation; pages
+# without a known schema only need a name
+CREATE_SCHEMAS = {"users": UserCreate, "roles": RoleCreate}
+
+def required_fields(resource: str) -> List[str]:
+    schema = CREATE_SCHEMAS.get(resource)
+    if schema is None:
+        return ["name"]
+    return [name for name, field in schema.model_fields.items() if field.is_required()]
+
+def extract_entities(query: str, resource: str) -> dict:
+    """Extract create-action fields (name, phone, email, permissions...) from the query"""
+    data = {}
+    name_match = NAME_PATTERN.search(query)
+    if name_match:
+        data["name"] = name_match.group(1).strip().strip("'\"")
+    if resource == "users":
+        phone_match = PHONE_PATTERN.search(query)
+        if phone_match:
+            data["phone_number"] = phone_match.group(1)
+        email_match = EMAIL_PATTERN.search(query)
+        if email_match:
+            data["email"] = email_match.group(0)
+    elif resource == "roles":
+        permissions_match = PERMISSIONS_PATTERN.search(query)
+        if permissions_match:
+            permissions = re.split(r",|\band\b", permissions_match.group(1))
+            data["permissions"] = [p.strip() for p in permissions if p.strip()]
+        description_match = DESCRIPTION_PATTERN.search(query)
+        if description_match:
+            data["description"] = description_match.group(1)
+    return data
+
+class PagePattern:
+    """Compiled matcher for one page"""
+
+    def __init__(self, name: str, route: str, create_endpoint: Optional[str]):
+        self.name = name
+        self.route = route
+        self.create_endpoint = create_endpoint
+        self.singular = name[:-1] if name.endswith("s") else name
+        self.pattern = re.compile(rf"\b{re.escape(self.singular)}s?\b", re.IGNORECASE)
+
+class IntentRouter:
+    """Deterministic first-stage router for unambiguous navigate/create commands.
+
+    Built from the Page rows: every page contributes a compiled pattern for
+    its name (singular or plural). route() returns the action together with a
+    confidence; callers only trust it above FAST_PATH_MIN_CONFIDENCE and send
+    everything else down the full RAG path.
+    """
+
+    def __init__(self, pages: Iterable[dict]):
+        self.pages: List[PagePattern] = [
+            PagePattern(page["name"], page["route"], (page.get("api_endpoints") or {}).get("post"))
+            for page in pages
+        ]
+
+    def match_pages(self, query: str) -> List[PagePattern]:
+        """Pages whose name (singular or plural) appears in the query"""
+        return [page for page in self.pages if page.pattern.search(query)]
+
+    def route(self, query: str) -> Tuple[Optional[dict], float]:
+        """Resolve a query to (action, confidence); action is None when nothing matched"""
+        matched = self.match_pages(query)
+        if len(matched) != 1:
+            return None, 0.0
+        page = matched[0]
+
+        wants_navigate = NAVIGATE_PATTERN.search(query) is not None
+        wants_create = CREATE_PATTERN.search(query) is not None
+        is_question = QUESTION_PATTERN.search(query) is not None
+
+        if wants_create and not wants_navigate and page.create_endpoint:
+            data = extract_entities(query, page.name)
+            message = f"Creating new {page.singular}"
+            if "name" in data:
+                message = f"Creating new {page.singular} {data['name']}"
+            # With a required field missing the LLM may still do better at
+            # extraction, or ask for it; the endpoint would reject the create
+            complete = all(field in data for field in required_fields(page.name))
+            confidence = 0.95 if complete else 0.5
+            if is_question:
+                confidence = 0.3
+            return {
+                "action_type": "create",
+                "target_page": page.name,
+                "route": page.route,
+                "api_call": {
+                    "method": "POST",
+                    "endpoint": page.create_endpoint,
+                    "data": data
+                },
+                "message": message
+            }, confidence
+
+        if wants_create:
+            return None, 0.0
+
+        # A bare page mention ("users page") is probably navigation, but not certainly
+        confidence = 0.95 if wants_navigate else 0.6
+        if is_question:
+            confidence = 0.3
+        return {
+            "action_type": "navigate",
+            "target_page": page.name,
+            "route": page.route,
+            "message": f"Navigating to {page.name} page"
+        }, confidence
+
+_router = IntentRouter([])
+
+def get_router() -> IntentRouter:
+    return _router
+
+def rebuild_router(pages: Iterable) -> IntentRouter:
+    """Rebuild the router from Page rows (ORM objects, catalog entries or dicts)"""
+    global _router
+    router = IntentRouter(
+        page if isinstance(page, dict) else {
+            "name": page.name,
+            "route": page.route,
+            "api_endpoints": page.api_endpoints,
+        }
+        for page in pages
+    )
+    _router = router
+    return router
+
+def route_fast_path(query: str) -> Optional[dict]:
+    """Return an action if the router is confident enough to skip Qdrant and Ollama"""
+    action, confidence = _router.route(query)
+    if action is not None and confidence >= FAST_PATH_MIN_CONFIDENCE:
+        return action
+    return None
@@ -0,0 +1,168 @@
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+import hashlib
+import json
+import os
+import threading
+import uuid
+
+from fastapi import Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.pagination import KeysetQuery
+from app.pg_notify import notify
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; the stdlib encoder gives the same output, slower
+    orjson = None
+
+LIST_CACHE_MAX_ENTRIES = int(os.getenv("LIST_CACHE_MAX_ENTRIES", "256"))
+TABLE_VERSIONS_CHANNEL = "table_versions"
+
+def encode_json(items) -> bytes:
+    """Encode list rows (plain dicts of str/int/datetime/list values) straight to JSON bytes"""
+    if orjson is not None:
+        return orjson.dumps(items)
+    return json.dumps(items, default=lambda value: value.isoformat(), separators=(",", ":")).encode("utf-8")
+
+class TableVersions:
+    """Per-table version tokens; any write to a table gives it a new token.
+
+    Tokens are random rather than counters so that a worker that learns of
+    a change over NOTIFY adopts exactly the writer's token, and the ETags of
+    all workers agree once they have seen the same write.
+    """
+
+    def __init__(self):
+        self._tokens: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def get(self, table: str) -> str:
+        with self._lock:
+            if table not in self._tokens:
+                self._tokens[table] = uuid.uuid4().hex[:12]
+            return self._tokens[table]
+
+    def set(self, table: str, token: str):
+        with self._lock:
+            self._tokens[table] = token
+
+    def bump(self, table: str) -> str:
+        token = uuid.uuid4().hex[:12]
+        self.set(table, token)
+        return token
+
+    def bump_all(self):
+        with self._lock:
+            self._tokens.clear()
+
+class _Page:
+    __slots__ = ("body", "next_cursor")
+
+    def __init__(self, body: bytes, next_cursor: Optional[str]):
+        self.body = body
+        self.next_cursor = next_cursor
+
+class ListCache:
+    """Encoded JSON bodies of list pages, keyed by (table, version, query string).
+
+    A new table version changes every key, so stale pages are never served;
+    they simply age out of the LRU.
+    """
+
+    def __init__(self, max_entries: int = LIST_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, str, str], _Page]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+
+    def get(self, key: Tuple[str, str, str]) -> Optional[_Page]:
+        with self._lock:
+            page = self._entries.get(key)
+            if page is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return page
+
+    def put(self, key: Tuple[str, str, str], page: _Page):
+        with self._lock:
+            self._entries[key] = page
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "not_modified": self.not_modified,
+        }
+
+table_versions = TableVersions()
+list_cache = ListCache()
+
+def canonical_query(request: Request) -> str:
+    return "&".join(f"{key}={value}" for key, value in sorted(request.query_params.multi_items()))
+
+def make_etag(table: str, version: str, query: str) -> str:
+    digest = hashlib.sha1(f"{table}?{query}".encode("utf-8")).hexdigest()[:16]
+    return f'"{version}-{digest}"'
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+
+async def cached_list_page(request: Request, db: AsyncSession, table: str, query: KeysetQuery) -> Response:
+    """Serve a keyset page with ETag/If-None-Match, from the encoded-body cache when possible.
+
+    The ETag depends only on the table version and the query string, so a
+    matching If-None-Match is answered 304 without touching the database.
+    The version is read before querying: a write that lands mid-query can
+    only make a newer body carry the older ETag, never the reverse.
+    """
+    version = table_versions.get(table)
+    query_string = canonical_query(request)
+    etag = make_etag(table, version, query_string)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+
+    key = (table, version, query_string)
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        list_cache.not_modified += 1
+        page = list_cache.get(key)
+        if page is not None and page.next_cursor:
+            headers["X-Next-Cursor"] = page.next_cursor
+        return Response(status_code=304, headers=headers)
+
+    page = list_cache.get(key)
+    if page is None:
+        result = await db.execute(query.statement)
+        items, next_cursor = query.page(result.mappings().all())
+        page = _Page(encode_json(items), next_cursor)
+        list_cache.put(key, page)
+    if page.next_cursor:
+        headers["X-Next-Cursor"] = page.next_cursor
+    return Response(content=page.body, media_type="application/json", headers=headers)
+
+async def table_changed(db: AsyncSession, table: str):
+    """Give a table a new version after a committed write and tell the other workers"""
+    token = table_versions.bump(table)
+    await notify(db, TABLE_VERSIONS_CHANNEL, f"{table}={token}")
+    await db.commit()
+
+async def on_table_changed(payload: str):
+    """NOTIFY handler: adopt another worker's version token"""
+    table, _, token = payload.partition("=")
+    if table and token:
+        table_versions.set(table, token)
+
+async def on_listen_connected():
+    """Changes may have been missed while not listening: give every table a new version"""
+    table_versions.bump_all()
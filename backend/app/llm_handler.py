@@ -1,211 +1,356 @@
-import requests
+from typing import AsyncIterator, List, Optional, Tuple
+from app.stream_parser import IncrementalActionParser
+from app.intent_router import NAVIGATE_PATTERN, extract_entities, get_router
+from app.health import ollama_breaker
+from app.llm_scheduler import SchedulerRejected, llm_scheduler
+from app.logging_config import log_sampled
+from app.page_catalog import page_catalog
+from app.data_queries import check_query_call
+from app.metrics import (
+    FALLBACKS, JSON_PARSE_FAILURES, LLM_ESCALATIONS, LLM_SHED, LLM_TIER_RESULTS, LLM_TIER_SECONDS, LLM_TIMEOUTS,
+    observe_stage, record_ollama_stats
+)
+from app.schema import ChatResponse
+from pydantic import ValidationError
+import copy
+import httpx
 import json
-import re
+import logging
+import os
+import time
 
-OLLAMA_URL = "http://ollama:11434/api/generate"
+logger = logging.getLogger(__name__)
 
-def query_ollama(context: str, query: str) -> dict:
-    prompt = f"""You are a smart dashboard assistant. Based on the user query and available context, determine the appropriate action.
+OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL", "http://ollama:11434")
+OLLAMA_URL = f"{OLLAMA_BASE_URL}/api/chat"
+OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "qwen2:0.5b")
+# Larger model asked only when the small one's action fails check_action; empty disables the cascade
+OLLAMA_ESCALATION_MODEL = os.getenv("OLLAMA_ESCALATION_MODEL", "")
+# A router reading at least this confident that contradicts the small model triggers escalation
+CASCADE_ROUTER_CONFIDENCE = float(os.getenv("CASCADE_ROUTER_CONFIDENCE", "0.6"))
+# Lowest router confidence the keyword fallback still acts on (questions score 0.3)
+FALLBACK_MIN_CONFIDENCE = float(os.getenv("FALLBACK_MIN_CONFIDENCE", "0.5"))
+OLLAMA_MAX_CONNECTIONS = int(os.getenv("OLLAMA_MAX_CONNECTIONS", "10"))
+# Keep the model (and its cached prompt prefix) loaded between requests
+OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+# Upper bound on generated tokens; a complete action is well under this
+LLM_MAX_TOKENS = int(os.getenv("LLM_MAX_TOKENS", "256"))
+# Ollama answers these when its queue (OLLAMA_MAX_QUEUE) is full
+OLLAMA_BUSY_STATUSES = (429, 503)
 
-Available pages:
-{context}
+ACTION_TYPES = ["navigate", "create", "show", "query", "general"]
+API_CALL_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "method": {"type": "string", "enum": ["GET", "POST"]},
+        "endpoint": {"type": "string"},
+        "data": {"type": "object"},
+    },
+    "required": ["method", "endpoint", "data"],
+}
 
-User query: {query}
+def response_format() -> dict:
+    """JSON schema for Ollama's `format` option, derived from ChatResponse.
+
+    action_type and api_call are narrowed to what the prompt allows, and
+    every field is required so keys always come in model order with
+    action_type first, which lets the stream parser act on it early.
+    """
+    schema = ChatResponse.model_json_schema()
+    properties = schema["properties"]
+    properties["action_type"] = {"type": "string", "enum": ACTION_TYPES}
+    properties["api_call"] = {"anyOf": [API_CALL_SCHEMA, {"type": "null"}]}
+    schema["required"] = list(properties)
+    return schema
+
+RESPONSE_FORMAT = response_format()
+
+_http_client: Optional[httpx.AsyncClient] = None
+
+def get_http_client() -> httpx.AsyncClient:
+    """Return the shared, connection-pooled Ollama client"""
+    global _http_client
+    if _http_client is None:
+        _http_client = httpx.AsyncClient(
+            timeout=httpx.Timeout(30.0, connect=5.0),
+            limits=httpx.Limits(
+                max_connections=OLLAMA_MAX_CONNECTIONS,
+                max_keepalive_connections=OLLAMA_MAX_CONNECTIONS,
+            ),
+        )
+    return _http_client
+
+async def close_http_client():
+    """Close the shared Ollama client"""
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+# Static instructions and few-shot examples. They never change between requests, so
+# as the first message of every /api/chat call Ollama can reuse their KV cache and
+# only evaluate the per-request context and query that follow.
+SYSTEM_PROMPT = """You are a smart dashboard assistant. Based on the user query and available context, determine the appropriate action.
 
 STRICT RULES:
 1. For navigation: use action_type "navigate" with route like "/users" or "/roles" (NO /api/)
 2. For creating: use action_type "create" with api_call object containing method, endpoint, and data
 3. ALWAYS include api_call for create actions
 4. Extract exact names and phone numbers from user input
+5. To create several records at once, use ONE api_call to the ":bulk" endpoint with data {"items": [...]}
+6. For questions about the data, use action_type "query" with a GET api_call to one of: /api/query/count {"resource"}, /api/query/created_since {"resource", "days"}, /api/query/latest {"resource", "limit"}, /api/query/find_by_name {"resource", "name"}, /api/query/find_by_phone {"phone_number"}, /api/query/search {"resource", "text"}. The answer is filled in from the database; never guess numbers
 
 Examples:
-- "show me users" -> {{"action_type": "navigate", "target_page": "users", "route": "/users", "message": "Navigating to users page"}}
-- "create user with name John and phone 123456" -> {{"action_type": "create", "target_page": "users", "route": "/users", "api_call": {{"method": "POST", "endpoint": "/api/users", "data": {{"name": "John", "phone_number": "123456"}}}}, "message": "Creating new user John"}}
+- "show me users" -> {"action_type": "navigate", "target_page": "users", "route": "/users", "message": "Navigating to users page"}
+- "create user with name John and phone 123456" -> {"action_type": "create", "target_page": "users", "route": "/users", "api_call": {"method": "POST", "endpoint": "/api/users", "data": {"name": "John", "phone_number": "123456"}}, "message": "Creating new user John"}
+- "create users John 123456 and Mary 654321" -> {"action_type": "create", "target_page": "users", "route": "/users", "api_call": {"method": "POST", "endpoint": "/api/users:bulk", "data": {"items": [{"name": "John", "phone_number": "123456"}, {"name": "Mary", "phone_number": "654321"}]}}, "message": "Creating 2 new users"}
+- "how many roles were added this week?" -> {"action_type": "query", "target_page": "roles", "route": null, "api_call": {"method": "GET", "endpoint": "/api/query/created_since", "data": {"resource": "roles", "days": 7}}, "message": "Counting new roles"}
+
+Respond ONLY with valid JSON."""
 
-Respond ONLY with valid JSON:"""
+def build_messages(context: str, query: str) -> List[dict]:
+    """Chat messages: the fixed system prefix, then this request's context and query"""
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": f"Available pages:\n{context}\n\nUser query: {query}"},
+    ]
 
-    payload = {
-        "model": "qwen2:0.5b",
-        "prompt": prompt,
-        "stream": False
+def chat_payload(context: str, query: str, stream: bool, model: str = OLLAMA_MODEL) -> dict:
+    return {
+        "model": model,
+        "messages": build_messages(context, query),
+        "stream": stream,
+        "keep_alive": OLLAMA_KEEP_ALIVE,
+        "format": RESPONSE_FORMAT,
+        "options": {"num_predict": LLM_MAX_TOKENS},
     }
-    print(query)
-    print(context)
-    
+
+def request_timeout(deadline: float) -> httpx.Timeout:
+    """Client timeout that ends at the request's scheduler deadline"""
+    return httpx.Timeout(max(deadline - time.monotonic(), 1.0), connect=5.0)
+
+async def probe_ollama():
+    """Health probe: the Ollama server answers on its root endpoint"""
+    response = await get_http_client().get(f"{OLLAMA_BASE_URL}/", timeout=5)
+    response.raise_for_status()
+
+async def query_ollama(context: str, query: str, client_id: str = "anonymous",
+                       deadline: Optional[float] = None) -> dict:
+    """Generate the action for a query; the response is read as a stream so it ends when the object closes"""
     try:
-        # Check if Ollama is accessible
-        health_response = requests.get("http://ollama:11434/", timeout=5)
-        if health_response.status_code != 200:
-            return get_fallback_response(query)
-    except requests.RequestException:
-        print("Ollama service is not accessible, using fallback response")
-        return get_fallback_response(query)
+        async for event in stream_ollama(context, query, client_id, deadline):
+            if event["type"] == "final":
+                return event["response"]
+    except Exception:
+        logger.exception("Unexpected error in LLM handler")
+    return get_fallback_response(query)
+
+async def stream_ollama(context: str, query: str, client_id: str = "anonymous",
+                        deadline: Optional[float] = None) -> AsyncIterator[dict]:
+    """Stream an Ollama completion as chat events, escalating through the model tiers.
+
+    Yields {"type": "token"} events as text arrives, an {"type": "action"}
+    event each time another top-level field of the action JSON is complete,
+    and finally a single {"type": "final"} event with the fixed response.
+    Output is constrained to RESPONSE_FORMAT, and the connection is closed
+    (stopping generation) as soon as the JSON object is complete.
+
+    With OLLAMA_ESCALATION_MODEL set, the small model answers first. If its
+    action fails check_action, an {"type": "escalate"} event is sent and the
+    larger model is asked. Partial actions are only streamed from the last
+    tier, so the client never acts on an answer that may be replaced.
+    """
+    log_sampled(logger, "llm request", query=query, context_chars=len(context))
     
-    try:
-        response = requests.post(OLLAMA_URL, json=payload, timeout=30)
-        response.raise_for_status()
-        
-        response_data = response.json()
-        print(response_data)
-        
-        if "response" not in response_data:
-            print(f"Unexpected Ollama response structure: {response_data}")
-            return get_fallback_response(query)
-            
-        response_text = response_data["response"]
-        
-        # Extract JSON from response
-        json_match = re.search(r'\{.*\}', response_text, re.DOTALL)
-        if json_match:
-            try:
-                llm_result = json.loads(json_match.group())
-                
-                # Validate and fix common LLM mistakes
-                llm_result = fix_llm_response(llm_result, query)
-                return llm_result
-                
-            except json.JSONDecodeError as e:
-                print(f"Failed to parse JSON from LLM response: {e}")
-                print(f"Raw response: {response_text}")
+    # Availability is tracked by the background health monitor
+    if not ollama_breaker.allow_request():
+        yield {"type": "final", "response": get_fallback_response(query)}
+        return
+    
+    deadline = llm_scheduler.deadline() if deadline is None else deadline
+    tiers = model_tiers()
+    best = None
+    for tier, model in enumerate(tiers):
+        last_tier = tier == len(tiers) - 1
+        parser = IncrementalActionParser()
+        started = time.perf_counter()
+        try:
+            async for event in stream_model(model, context, query, client_id, deadline, parser, last_tier):
+                yield event
+        except SchedulerRejected as e:
+            logger.info("Ollama request shed (%s), using fallback", e.reason)
+            yield {"type": "final", "response": best or get_fallback_response(query)}
+            return
+        except httpx.HTTPStatusError as e:
+            if e.response.status_code not in OLLAMA_BUSY_STATUSES:
+                logger.warning("Request error when calling Ollama (%s): %r", model, e)
+                ollama_breaker.record_failure(e)
+            else:
+                # Ollama's own queue is full: backpressure, not an outage
+                logger.info("Ollama busy (%s, %d), using fallback", model, e.response.status_code)
+                LLM_SHED.labels("ollama_busy").inc()
+            yield {"type": "final", "response": best or get_fallback_response(query)}
+            return
+        except (httpx.HTTPError, json.JSONDecodeError) as e:
+            # A malformed or truncated NDJSON line counts as a failed request
+            if isinstance(e, httpx.TimeoutException):
+                LLM_TIMEOUTS.inc()
+            logger.warning("Request error when calling Ollama (%s): %r", model, e)
+            ollama_breaker.record_failure(e)
+            yield {"type": "final", "response": best or get_fallback_response(query)}
+            return
+        finally:
+            LLM_TIER_SECONDS.labels(model).observe(time.perf_counter() - started)
         
-        # Fallback response
-        return get_fallback_response(query)
-    except requests.RequestException as e:
-        print(f"Request error when calling Ollama: {e}")
-        return get_fallback_response(query)
-    except Exception as e:
-        print(f"Unexpected error in LLM handler: {e}")
-        return get_fallback_response(query)
+        log_sampled(logger, "llm response", query=query, model=model, response=parser.text)
+        llm_result, problem = parse_action(parser, query)
+        if llm_result is not None and problem is not None:
+            # Failed check_action: still answered when nothing better comes, but never cached
+            llm_result["unverified"] = True
+        if problem is None or (last_tier and llm_result is not None):
+            LLM_TIER_RESULTS.labels(model, "accepted" if problem is None else "unverified").inc()
+            yield {"type": "final", "response": llm_result}
+            return
+        LLM_TIER_RESULTS.labels(model, "rejected").inc()
+        LLM_ESCALATIONS.labels(problem).inc()
+        best = best or llm_result
+        if not last_tier:
+            yield {"type": "escalate", "model": tiers[tier + 1], "reason": problem}
+    
+    yield {"type": "final", "response": best or get_fallback_response(query)}
+
+async def stream_model(model: str, context: str, query: str, client_id: str, deadline: float,
+                       parser: IncrementalActionParser, emit_actions: bool) -> AsyncIterator[dict]:
+    """One model's token stream, fed into parser; stops once the action object is complete"""
+    payload = chat_payload(context, query, stream=True, model=model)
+    async with llm_scheduler.slot(client_id, deadline=deadline):
+        with observe_stage("generate"):
+            async with get_http_client().stream("POST", OLLAMA_URL, json=payload,
+                                                timeout=request_timeout(deadline)) as response:
+                response.raise_for_status()
+                ollama_breaker.record_success()
+                async for line in response.aiter_lines():
+                    if not line:
+                        continue
+                    chunk = json.loads(line)
+                    if chunk.get("done"):
+                        record_ollama_stats(chunk)
+                    token = chunk.get("message", {}).get("content", "")
+                    if token:
+                        yield {"type": "token", "content": token}
+                        if parser.feed(token) and emit_actions:
+                            yield {"type": "action", "action": fix_llm_response(dict(parser.fields), query)}
+                    if parser.complete or chunk.get("done"):
+                        break
+
+def parse_action(parser: IncrementalActionParser, query: str) -> Tuple[Optional[dict], Optional[str]]:
+    """Validate, repair and check one tier's output: (action or None, problem or None)"""
+    try:
+        with observe_stage("json_validate"):
+            llm_result = validate_action(parser.result())
+    except (json.JSONDecodeError, ValidationError) as e:
+        JSON_PARSE_FAILURES.inc()
+        logger.info("LLM output is not a valid action: %s", e)
+        return None, "invalid_json"
+    with observe_stage("fix_response"):
+        original = copy.deepcopy(llm_result)
+        llm_result = fix_llm_response(llm_result, query)
+    problem = check_action(llm_result, query)
+    if problem is None and any(llm_result.get(key) != original.get(key) for key in ("route", "api_call")):
+        # fix_llm_response had to correct the route or fill in the api_call
+        problem = "repaired"
+    return llm_result, problem
+
+def check_action(action: dict, query: str) -> Optional[str]:
+    """Check an action against the known pages; returns why it is not trusted, or None"""
+    action_type = action.get("action_type")
+    if action_type == "navigate":
+        if page_catalog.by_route(action.get("route")) is None:
+            return "unknown_route"
+    elif action_type == "create":
+        api_call = action.get("api_call") or {}
+        endpoint = str(api_call.get("endpoint") or "")
+        if endpoint.endswith(":bulk"):
+            endpoint = endpoint[:-len(":bulk")]
+        if endpoint not in page_catalog.create_endpoints():
+            return "unknown_endpoint"
+        if api_call.get("method") != "POST" or not api_call.get("data"):
+            return "incomplete_api_call"
+    elif action_type == "query":
+        problem = check_query_call(action.get("api_call"))
+        if problem is not None:
+            return problem
+    
+    # Low confidence: the deterministic router has a reasonably sure, different reading
+    hint, confidence = get_router().route(query)
+    if hint is not None and confidence >= CASCADE_ROUTER_CONFIDENCE and (
+        (hint["action_type"], hint["target_page"]) != (action_type, action.get("target_page"))
+    ):
+        return "disagrees_with_router"
+    return None
+
+def model_tiers() -> List[str]:
+    return [OLLAMA_MODEL] + ([OLLAMA_ESCALATION_MODEL] if OLLAMA_ESCALATION_MODEL else [])
+
+def validate_action(llm_result: dict) -> dict:
+    """Check a parsed LLM object against ChatResponse, keeping only its fields"""
+    return ChatResponse(**llm_result).dict()
 
 def fix_llm_response(llm_result: dict, query: str) -> dict:
     """Fix common LLM mistakes in the response"""
     
-    # If it's a create action but missing api_call, add it
-    if llm_result.get("action_type") == "create" and "api_call" not in llm_result:
-        query_lower = query.lower()
-        
-        if "user" in query_lower:
-            # Extract name and phone from query
-            name_match = re.search(r'name\s+([^and]+?)(?:\s+and|\s+phone|\s*$)', query, re.IGNORECASE)
-            phone_match = re.search(r'phone\s+(\d+)', query, re.IGNORECASE)
-            
-            data = {}
-            if name_match:
-                data["name"] = name_match.group(1).strip()
-            if phone_match:
-                data["phone_number"] = phone_match.group(1)
+    # If it's a create action but missing api_call, add it for the page the query names
+    if llm_result.get("action_type") == "create" and not llm_result.get("api_call"):
+        mentioned = [page for page in get_router().match_pages(query) if page.create_endpoint]
+        if mentioned:
+            page = mentioned[0]
+            data = extract_entities(query, page.name)
             
             llm_result["api_call"] = {
                 "method": "POST",
-                "endpoint": "/api/users",
+                "endpoint": page.create_endpoint,
                 "data": data
             }
-            llm_result["target_page"] = "users"
-            llm_result["route"] = "/users"
+            llm_result["target_page"] = page.name
+            llm_result["route"] = page.route
             
-            if name_match:
-                llm_result["message"] = f"Creating new user {data['name']}"
-        
-        elif "role" in query_lower:
-            # Extract role name
-            name_match = re.search(r'name\s+([^and]+?)(?:\s+and|\s+with|\s*$)', query, re.IGNORECASE)
-            
-            data = {}
-            if name_match:
-                data["name"] = name_match.group(1).strip()
-            
-            llm_result["api_call"] = {
-                "method": "POST",
-                "endpoint": "/api/roles",
-                "data": data
-            }
-            llm_result["target_page"] = "roles"
-            llm_result["route"] = "/roles"
-            
-            if name_match:
-                llm_result["message"] = f"Creating new role {data['name']}"
+            if "name" in data:
+                llm_result["message"] = f"Creating new {page.singular} {data['name']}"
+    
+    # Several rows in one create go to the bulk endpoint as {"items": [...]}
+    api_call = llm_result.get("api_call")
+    if llm_result.get("action_type") == "create" and isinstance(api_call, dict):
+        data = api_call.get("data")
+        if isinstance(data, list):
+            api_call["data"] = data = {"items": data}
+        endpoint = api_call.get("endpoint") or ""
+        if isinstance(data, dict) and isinstance(data.get("items"), list) and not endpoint.endswith(":bulk"):
+            api_call["endpoint"] = f"{endpoint}:bulk"
     
-    # Fix wrong routes for navigation
+    # Fix wrong routes for navigation from the page catalog
     if llm_result.get("action_type") == "navigate":
-        if llm_result.get("target_page") == "users":
-            llm_result["route"] = "/users"
-        elif llm_result.get("target_page") == "roles":
-            llm_result["route"] = "/roles"
+        page = page_catalog.get(llm_result.get("target_page")) or page_catalog.by_route(llm_result.get("route"))
+        if page is not None:
+            llm_result["target_page"] = page.name
+            llm_result["route"] = page.route
     
     return llm_result
 
 def get_fallback_response(query: str) -> dict:
     """Generate a simple fallback response when LLM is not available"""
-    query_lower = query.lower()
-    
-    # Simple keyword matching for basic functionality
-    if any(word in query_lower for word in ["user", "users"]):
-        if any(word in query_lower for word in ["show", "view", "see", "list", "go"]):
-            return {
-                "action_type": "navigate",
-                "target_page": "users",
-                "route": "/users",
-                "message": "Navigating to users page"
-            }
-        elif any(word in query_lower for word in ["create", "add", "new"]):
-            # Try to extract name and phone from query
-            name_match = re.search(r'name\s+([^and]+?)(?:\s+and|\s+phone|\s*$)', query, re.IGNORECASE)
-            phone_match = re.search(r'phone\s+(\d+)', query, re.IGNORECASE)
-            
-            data = {}
-            message = "Creating new user"
-            
-            if name_match:
-                data["name"] = name_match.group(1).strip()
-                message = f"Creating new user {data['name']}"
-            if phone_match:
-                data["phone_number"] = phone_match.group(1)
-                
-            return {
-                "action_type": "create",
-                "target_page": "users",
-                "route": "/users",
-                "api_call": {
-                    "method": "POST",
-                    "endpoint": "/api/users",
-                    "data": data
-                },
-                "message": message
-            }
+    FALLBACKS.labels("response").inc()
     
-    elif any(word in query_lower for word in ["role", "roles"]):
-        if any(word in query_lower for word in ["show", "view", "see", "list", "go"]):
-            return {
-                "action_type": "navigate",
-                "target_page": "roles",
-                "route": "/roles",
-                "message": "Navigating to roles page"
-            }
-        elif any(word in query_lower for word in ["create", "add", "new"]):
-            # Try to extract role name
-            name_match = re.search(r'name\s+([^and]+?)(?:\s+and|\s+with|\s*$)', query, re.IGNORECASE)
-            
-            data = {}
-            message = "Creating new role"
-            
-            if name_match:
-                data["name"] = name_match.group(1).strip()
-                message = f"Creating new role {data['name']}"
-                
-            return {
-                "action_type": "create",
-                "target_page": "roles",
-                "route": "/roles",
-                "api_call": {
-                    "method": "POST",
-                    "endpoint": "/api/roles",
-                    "data": data
-                },
-                "message": message
-            }
+    # The intent router's keyword matching covers every page in the catalog.
+    # Marked "fallback" so the response cache does not keep it after Ollama recovers
+    action, confidence = get_router().route(query)
+    if action is not None and confidence >= FALLBACK_MIN_CONFIDENCE:
+        # A bare page mention ("delete user John") is not a request to go there
+        if action["action_type"] != "navigate" or NAVIGATE_PATTERN.search(query):
+            return {**action, "fallback": True}
     
     # Default response
     return {
         "action_type": "general",
-        "message": "I can help you navigate to users or roles pages, or create new users. Try saying 'show me users' or 'create user with name John and phone 123456'."
-    }
\ No newline at end of file
+        "message": "I can help you navigate to users or roles pages, or create new users. Try saying 'show me users' or 'create user with name John and phone 123456'.",
+        "fallback": True
+    }
@@ -0,0 +1,242 @@
+from contextlib import asynccontextmanager, nullcontext
+from typing import Dict, List, Optional
+import asyncio
+import heapq
+import itertools
+import logging
+import os
+import random
+import time
+
+from sqlalchemy import text
+
+from app.database import advisory_lock_key, async_engine
+from app.metrics import LLM_IN_FLIGHT, LLM_QUEUE_DEPTH, LLM_QUEUE_WAIT_SECONDS, LLM_SHED
+
+logger = logging.getLogger(__name__)
+
+# Match the Ollama server: more concurrent requests than OLLAMA_NUM_PARALLEL only queue there
+LLM_CONCURRENCY = int(os.getenv("OLLAMA_NUM_PARALLEL", "1"))
+LLM_QUEUE_SIZE = int(os.getenv("LLM_QUEUE_SIZE", "32"))
+LLM_DEADLINE_SECONDS = float(os.getenv("LLM_DEADLINE_SECONDS", "15"))
+# Generation time assumed until real ones have been observed
+LLM_INITIAL_SERVICE_SECONDS = float(os.getenv("LLM_INITIAL_SERVICE_SECONDS", "3"))
+LLM_SERVICE_EWMA_ALPHA = 0.2
+# Set by gunicorn.conf.py: the OLLAMA_NUM_PARALLEL slots are shared by every worker
+LLM_SHARED_SLOTS = os.getenv("LLM_SHARED_SLOTS", "0") == "1"
+LLM_SLOT_POLL_SECONDS = float(os.getenv("LLM_SLOT_POLL_SECONDS", "0.05"))
+
+class SchedulerRejected(Exception):
+    """The request was shed; the caller should answer with a fallback right away"""
+
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+class _Ticket:
+    __slots__ = ("client_id", "deadline", "enqueued_at", "future")
+
+    def __init__(self, client_id: str, deadline: float, future: asyncio.Future):
+        self.client_id = client_id
+        self.deadline = deadline
+        self.enqueued_at = time.monotonic()
+        self.future = future
+
+class SharedSlots:
+    """Ollama slots shared by all processes on the same Postgres, as advisory locks.
+
+    Each process still queues its own requests fairly; a request admitted
+    locally then holds one of the `slots` session-level advisory locks for
+    its generation, on a pooled connection, polling until one is free. A
+    request that cannot get one before its deadline is shed. Without
+    Postgres, or when the database is unreachable, requests pass ungated.
+    """
+
+    def __init__(self, slots: int):
+        self.keys = [advisory_lock_key(f"llm_slot:{i}") for i in range(max(1, slots))]
+        self.enabled = async_engine.dialect.name == "postgresql"
+
+    @asynccontextmanager
+    async def hold(self, scheduler: "LLMScheduler", deadline: float):
+        if not self.enabled:
+            yield
+            return
+        try:
+            connection = await async_engine.connect()
+        except Exception as e:
+            logger.warning("Shared LLM slots unavailable, not gating: %r", e)
+            yield
+            return
+        released = False
+        try:
+            try:
+                key = await self._acquire(connection, scheduler, deadline)
+            except SchedulerRejected:
+                released = True  # shed before any lock was taken
+                raise
+            try:
+                yield
+            finally:
+                await connection.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": key})
+                released = True
+        finally:
+            if not released:
+                # Cancelled or failed while a lock may be held: closing the
+                # DBAPI connection releases it, returning it to the pool would not
+                await connection.invalidate()
+            await connection.close()
+
+    async def _acquire(self, connection, scheduler: "LLMScheduler", deadline: float) -> int:
+        # Start at a random slot so the processes do not all contend for the first one
+        offset = random.randrange(len(self.keys))
+        keys = self.keys[offset:] + self.keys[:offset]
+        while True:
+            for key in keys:
+                locked = await connection.scalar(text("SELECT pg_try_advisory_lock(:key)"), {"key": key})
+                if locked:
+                    return key
+            if time.monotonic() + LLM_SLOT_POLL_SECONDS + scheduler.service_seconds > deadline:
+                scheduler._shed("deadline")
+            await asyncio.sleep(LLM_SLOT_POLL_SECONDS)
+
+class LLMScheduler:
+    """Admission control in front of Ollama.
+
+    At most `concurrency` requests talk to Ollama at once; the rest wait in
+    a bounded queue. Clients are served by start-time fair queueing: each
+    queued request gets a virtual tag one past its client's previous tag,
+    so a client that sends a burst waits behind other clients' single
+    requests instead of starving them.
+
+    Requests are shed (SchedulerRejected) when the queue is full, when the
+    estimated wait plus generation time (an EWMA of observed generations)
+    would overrun their deadline, and again at dispatch if the deadline can
+    no longer be met, so a caller gets its fallback immediately instead of
+    after a client timeout.
+
+    With `shared` slots (several workers in front of one Ollama) the limit
+    also holds across processes: see SharedSlots.
+    """
+
+    def __init__(self, concurrency: int = LLM_CONCURRENCY, max_queue: int = LLM_QUEUE_SIZE,
+                 initial_service_seconds: float = LLM_INITIAL_SERVICE_SECONDS,
+                 shared: Optional[SharedSlots] = None):
+        self.concurrency = max(1, concurrency)
+        self.shared = shared
+        self.max_queue = max_queue
+        self.service_seconds = initial_service_seconds
+        self._heap: List[tuple] = []
+        self._queued = 0
+        self._active = 0
+        self._virtual_time = 0.0
+        self._client_tags: Dict[str, float] = {}
+        self._sequence = itertools.count()
+        self.admitted = 0
+        self.shed: Dict[str, int] = {}
+
+    def deadline(self, timeout: Optional[float] = None) -> float:
+        """Absolute (monotonic) deadline for a request starting now"""
+        return time.monotonic() + (LLM_DEADLINE_SECONDS if timeout is None else timeout)
+
+    def estimated_wait(self, ahead: int) -> float:
+        """Expected seconds until a request with `ahead` requests in front of it finishes"""
+        if self._active < self.concurrency and ahead == 0:
+            return self.service_seconds
+        return (ahead // self.concurrency + 1) * self.service_seconds + self.service_seconds
+
+    @asynccontextmanager
+    async def slot(self, client_id: str = "anonymous", deadline: Optional[float] = None):
+        """Hold one Ollama slot for the duration of the block, or raise SchedulerRejected"""
+        deadline = self.deadline() if deadline is None else deadline
+        await self._acquire(client_id, deadline)
+        try:
+            async with self.shared.hold(self, deadline) if self.shared else nullcontext():
+                started = time.monotonic()
+                try:
+                    yield
+                finally:
+                    self._observe_service(time.monotonic() - started)
+        finally:
+            self._release()
+
+    async def _acquire(self, client_id: str, deadline: float):
+        now = time.monotonic()
+        if self._active < self.concurrency and self._queued == 0:
+            self._start()
+            LLM_QUEUE_WAIT_SECONDS.observe(0)
+            return
+        if self._queued >= self.max_queue:
+            self._shed("queue_full")
+        if now + self.estimated_wait(self._queued) > deadline:
+            self._shed("deadline")
+
+        tag = max(self._virtual_time, self._client_tags.get(client_id, 0.0)) + 1
+        self._client_tags[client_id] = tag
+        ticket = _Ticket(client_id, deadline, asyncio.get_running_loop().create_future())
+        heapq.heappush(self._heap, (tag, next(self._sequence), ticket))
+        self._queued += 1
+        LLM_QUEUE_DEPTH.set(self._queued)
+        try:
+            await ticket.future
+        except asyncio.CancelledError:
+            if ticket.future.done() and not ticket.future.cancelled() and ticket.future.exception() is None:
+                # The slot was handed over just as the caller went away
+                self._release()
+            elif not ticket.future.done():
+                ticket.future.cancel()
+            raise
+
+    def _start(self):
+        self._active += 1
+        self.admitted += 1
+        LLM_IN_FLIGHT.set(self._active)
+
+    def _release(self):
+        self._active -= 1
+        LLM_IN_FLIGHT.set(self._active)
+        self._dispatch()
+
+    def _dispatch(self):
+        """Hand free slots to the best queued requests that can still meet their deadline"""
+        while self._heap and self._active < self.concurrency:
+            tag, _, ticket = heapq.heappop(self._heap)
+            self._queued -= 1
+            LLM_QUEUE_DEPTH.set(self._queued)
+            if ticket.future.done():
+                continue  # cancelled while queued
+            self._virtual_time = max(self._virtual_time, tag)
+            now = time.monotonic()
+            if now + self.service_seconds > ticket.deadline:
+                self._count_shed("deadline")
+                ticket.future.set_exception(SchedulerRejected("deadline"))
+                continue
+            LLM_QUEUE_WAIT_SECONDS.observe(now - ticket.enqueued_at)
+            self._start()
+            ticket.future.set_result(None)
+        if not self._heap:
+            self._client_tags.clear()
+
+    def _observe_service(self, seconds: float):
+        self.service_seconds += LLM_SERVICE_EWMA_ALPHA * (seconds - self.service_seconds)
+
+    def _count_shed(self, reason: str):
+        self.shed[reason] = self.shed.get(reason, 0) + 1
+        LLM_SHED.labels(reason).inc()
+
+    def _shed(self, reason: str):
+        self._count_shed(reason)
+        raise SchedulerRejected(reason)
+
+    def stats(self) -> dict:
+        return {
+            "concurrency": self.concurrency,
+            "shared_slots": len(self.shared.keys) if self.shared and self.shared.enabled else 0,
+            "in_flight": self._active,
+            "queued": self._queued,
+            "max_queue": self.max_queue,
+            "service_seconds_ewma": round(self.service_seconds, 3),
+            "admitted": self.admitted,
+            "shed": dict(self.shed),
+        }
+
+llm_scheduler = LLMScheduler(shared=SharedSlots(LLM_CONCURRENCY) if LLM_SHARED_SLOTS else None)
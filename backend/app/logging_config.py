@@ -0,0 +1,45 @@
+import json
+import logging
+import os
+import random
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+# Share of hot-path debug events (queries, LLM output) that are logged at all
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "0.01"))
+LOG_MAX_FIELD_CHARS = int(os.getenv("LOG_MAX_FIELD_CHARS", "200"))
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: ts, level, logger, msg plus any structured fields"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        entry.update(getattr(record, "fields", {}))
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+def configure_logging():
+    handler = logging.StreamHandler()
+    handler.setFormatter(JsonFormatter())
+    root = logging.getLogger()
+    root.handlers = [handler]
+    root.setLevel(LOG_LEVEL)
+    # httpx logs every Ollama/Qdrant request at INFO
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+def log_sampled(logger: logging.Logger, msg: str, **fields):
+    """Debug-log a hot-path event for a sample of requests, truncating long fields.
+
+    Nothing is formatted unless the event is sampled and DEBUG is enabled.
+    """
+    if random.random() >= LOG_SAMPLE_RATE or not logger.isEnabledFor(logging.DEBUG):
+        return
+    logger.debug(msg, extra={"fields": {
+        key: value[:LOG_MAX_FIELD_CHARS] if isinstance(value, str) else value
+        for key, value in fields.items()
+    }})
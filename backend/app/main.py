@@ -1,17 +1,58 @@
-from fastapi import FastAPI, Request, Depends, HTTPException
+import time
+_import_started = time.perf_counter()
+
+from fastapi import BackgroundTasks, FastAPI, Request, Response, Depends, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+import asyncio
+import gc
+import json
+import logging
+import os
 
-from app.qdrant_handler import search_qdrant, initialize_qdrant
-from app.llm_handler import query_ollama
-from app.database import get_db, create_tables
+from app.qdrant_handler import (
+    search_qdrant, embed_query, initialize_qdrant, index_pages, probe_qdrant, close_qdrant, close_sync_client,
+    embedding_service, embed_executor, get_embedding_backend, warm_up_model
+)
+from app.llm_handler import query_ollama, stream_ollama, probe_ollama, close_http_client
+from app.database import DATABASE_URL, get_async_db, create_tables, engine, leader_lock, SessionLocal, AsyncSessionLocal, async_engine
 from app.models import User, Role, Page
 from app.schema import (
     ChatRequest, ChatResponse, UserCreate, UserResponse, 
-    RoleCreate, RoleResponse, PageCreate, PageResponse
+    RoleCreate, RoleResponse, PageCreate, PageResponse,
+    BulkCreateRequest, BulkCreateResponse
 )
 from app.seed_data import seed_pages
+from app.response_cache import response_cache
+from app.intent_router import route_fast_path
+from app.page_catalog import PAGE_CATALOG_CHANNEL, notify_pages_changed, page_catalog
+from app.pg_notify import PgListener
+from app.list_cache import (
+    TABLE_VERSIONS_CHANNEL, cached_list_page, list_cache, on_listen_connected, on_table_changed, table_changed,
+)
+from app.health import health_monitor, qdrant_breaker, ollama_breaker
+from app.startup_profile import startup_profile
+from app.pagination import DEFAULT_PAGE_SIZE, build_keyset_query, prefix_filter
+from app.bulk import bulk_create
+from app.data_queries import answer_query_action, install_table_stats, match_data_query, query_action, run_data_query
+from app.entity_search import (
+    ENTITY_SEARCH_LIMIT, ENTITY_SEMANTIC_SEARCH, index_entity_ids, initialize_entity_index, install_entity_search,
+    search_entities,
+)
+from app.llm_scheduler import llm_scheduler
+from app.logging_config import configure_logging
+from app.metrics import CACHE_LOOKUPS, CHAT_REQUESTS, observe_stage, render_metrics
+
+startup_profile.record("import", time.perf_counter() - _import_started)
+
+WARMUP_MODEL = os.getenv("WARMUP_MODEL", "1") == "1"
+
+configure_logging()
+logger = logging.getLogger(__name__)
 
 app = FastAPI(title="Dashboard AI Agent API")
 
@@ -21,22 +62,265 @@ app.add_middleware(
     allow_origins=["*"],
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag"],
 )
 
+# Set in the gunicorn master by preload(); workers forked from it skip prepare_data
+preloaded = False
+
 @app.on_event("startup")
 async def startup_event():
     """Initialize database and Qdrant on startup"""
-    create_tables()
-    seed_pages()
-    initialize_qdrant()
+    if not preloaded:
+        prepare_data()
+    else:
+        # Embedding runs after the fork, in one worker, off the event loop
+        asyncio.create_task(run_in_threadpool(sync_page_index))
+    health_monitor.register(qdrant_breaker, probe_qdrant)
+    health_monitor.register(ollama_breaker, probe_ollama)
+    await health_monitor.check_all()
+    health_monitor.start()
+    pg_listener.start()
+    
+    # The model loads in the background: the worker is live right away but
+    # only reports ready on /ready once the first encode has run
+    if ENTITY_SEMANTIC_SEARCH:
+        # The one-time backfill embeds every row, so it never holds up startup
+        asyncio.create_task(run_in_threadpool(initialize_entity_index))
+    if WARMUP_MODEL:
+        asyncio.create_task(warm_up())
+    else:
+        startup_profile.ready = True
+
+def prepare_data(warm_up: bool = False, index: bool = True):
+    """Create tables, seed pages and sync the page index, recording each stage.
+
+    The shared work runs in one process per deployment, under a Postgres
+    advisory lock; the others wait for it and only load their page catalog.
+    index=False leaves the page index to sync_page_index().
+    """
+    with leader_lock("startup") as leader:
+        if leader:
+            with startup_profile.stage("db_create"):
+                create_tables()
+                install_table_stats(engine)
+                install_entity_search(engine)
+            with startup_profile.stage("seed"):
+                seed_pages()
+        pages = load_pages()
+        if leader and index:
+            with startup_profile.stage("index"):
+                initialize_qdrant(pages)
+    page_catalog.load(pages)
+    if warm_up:
+        warm_up_model()
+
+def preload():
+    """Gunicorn master hook (preload_app): shared startup work and model weights, once, before forking.
+
+    Workers inherit the page catalog and the model weights copy-on-write.
+    Nothing is encoded here: inference thread pools do not survive a fork,
+    so the first encode (warm_up) and the page index sync (sync_page_index)
+    run in the workers.
+    """
+    global preloaded
+    prepare_data(index=False)
+    try:
+        get_embedding_backend()
+    except Exception as e:
+        logger.error("Error preloading the embedding model, workers will load their own: %r", e)
+    # Pooled connections must not be shared across the fork
+    engine.dispose()
+    close_sync_client()
+    # Move everything loaded so far out of the collector's reach, so its
+    # bookkeeping writes do not copy the shared pages into every worker
+    gc.freeze()
+    preloaded = True
+
+def sync_page_index():
+    """Bring the Qdrant page index in sync, in whichever worker gets there first; the others skip"""
+    with leader_lock("page_index", wait=False) as leader:
+        if leader:
+            with startup_profile.stage("index"):
+                initialize_qdrant(load_pages())
+
+async def warm_up():
+    """Load the embedding model off the event loop, then mark the worker ready"""
+    try:
+        await asyncio.get_running_loop().run_in_executor(embed_executor, warm_up_model)
+    except Exception as e:
+        logger.error("Error warming up the embedding model: %r", e)
+    startup_profile.ready = True
+
+def load_pages() -> List[Page]:
+    """Load every Page row for the startup indexing and the page catalog"""
+    db = SessionLocal()
+    try:
+        return db.query(Page).all()
+    finally:
+        db.close()
+
+async def reload_page_catalog():
+    """Reload the page catalog after another worker changed the pages table"""
+    async with AsyncSessionLocal() as db:
+        pages = (await db.execute(select(Page))).scalars().all()
+    page_catalog.load(pages)
+    response_cache.invalidate()
+
+async def on_pages_changed(payload: str):
+    await reload_page_catalog()
+
+# One LISTEN connection per worker for every cross-worker invalidation channel
+pg_listener = PgListener(DATABASE_URL)
+pg_listener.subscribe(PAGE_CATALOG_CHANNEL, on_pages_changed, on_connect=reload_page_catalog)
+pg_listener.subscribe(TABLE_VERSIONS_CHANNEL, on_table_changed, on_connect=on_listen_connected)
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Close pooled Qdrant, Ollama and database connections"""
+    await health_monitor.stop()
+    await pg_listener.stop()
+    await close_qdrant()
+    await close_http_client()
+    await async_engine.dispose()
 
 @app.post("/chat", response_model=ChatResponse)
-async def chat(request: ChatRequest):
+async def chat(request: ChatRequest, http_request: Request):
     """AI agent chat endpoint"""
     query = request.query
-    context = search_qdrant(query)
-    llm_response = query_ollama(context, query)
+    deadline = llm_scheduler.deadline()
+    # Data questions first: "show me the number of users" also reads as navigation
+    answered = await data_query_path(query)
+    if answered is not None:
+        CHAT_REQUESTS.labels("data_query").inc()
+        return to_chat_response(answered)
+    
+    routed = fast_path(query)
+    if routed is not None:
+        CHAT_REQUESTS.labels("fast_path").inc()
+        return to_chat_response(routed)
     
+    query_embedding = await embed_query_or_none(query)
+    cached = cache_lookup(query, query_embedding)
+    if cached is not None:
+        CHAT_REQUESTS.labels("cache").inc()
+        return to_chat_response(await answer_query_action(cached))
+    
+    CHAT_REQUESTS.labels("llm").inc()
+    context = await search_qdrant(query, query_embedding=query_embedding)
+    llm_response = await query_ollama(context, query, client_id(http_request), deadline)
+    # Cached before the answer is filled in, so a cache hit re-runs the query
+    response_cache.put(query, query_embedding, llm_response)
+    
+    return to_chat_response(await answer_query_action(llm_response))
+
+@app.post("/chat/stream")
+async def chat_stream(request: ChatRequest, http_request: Request):
+    """Streaming AI agent chat endpoint (NDJSON, one event per line)"""
+    query = request.query
+    deadline = llm_scheduler.deadline()
+    answered = await data_query_path(query)
+    query_embedding = None
+    path = "data_query"
+    if answered is None:
+        answered = fast_path(query)
+        path = "fast_path"
+    if answered is None:
+        query_embedding = await embed_query_or_none(query)
+        answered = cache_lookup(query, query_embedding)
+        path = "cache" if answered is not None else "llm"
+    CHAT_REQUESTS.labels(path).inc()
+
+    async def events():
+        if answered is not None:
+            # Data-query answers are already filled in; cached query actions are re-run
+            response = await answer_query_action(answered) if path == "cache" else answered
+            yield json.dumps({"type": "final", "response": to_chat_response(response).dict()}) + "\n"
+            return
+        context = await search_qdrant(query, query_embedding=query_embedding)
+        async for event in stream_ollama(context, query, client_id(http_request), deadline):
+            if event["type"] == "final":
+                response_cache.put(query, query_embedding, event["response"])
+                event["response"] = to_chat_response(await answer_query_action(event["response"])).dict()
+            yield json.dumps(event) + "\n"
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
+@app.get("/ready")
+async def ready():
+    """Readiness probe: 503 until the embedding model is loaded"""
+    if not startup_profile.ready:
+        return JSONResponse(status_code=503, content={"ready": False})
+    return {"ready": True}
+
+@app.get("/startup-profile")
+async def get_startup_profile():
+    """Cold-start stage timings of this worker"""
+    return startup_profile.as_dict()
+
+@app.get("/health")
+async def health():
+    """Dependency health as last seen by the background monitor"""
+    return health_monitor.status()
+
+@app.get("/chat/scheduler/stats")
+async def chat_scheduler_stats():
+    """Ollama admission queue: depth, slots in use, shed counts"""
+    return llm_scheduler.stats()
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics: per-stage latency, fallbacks, parse failures, LLM tokens"""
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
+
+@app.get("/chat/cache/stats")
+async def chat_cache_stats():
+    """Response and query-embedding cache counters"""
+    return {
+        "responses": response_cache.stats(),
+        "embeddings": embedding_service.stats(),
+    }
+
+@app.get("/api/cache/stats")
+async def list_cache_stats():
+    """Encoded list-page cache counters, including 304 Not Modified answers"""
+    return list_cache.stats()
+
+async def embed_query_or_none(query: str):
+    """Embed the query for cache lookup and retrieval, or None if the model fails"""
+    try:
+        with observe_stage("embed"):
+            return await embed_query(query)
+    except Exception as e:
+        logger.warning("Error embedding query: %r", e)
+        return None
+
+def client_id(request: Request) -> str:
+    """Fairness key for the LLM scheduler: X-Client-Id if sent, else the peer address"""
+    return request.headers.get("X-Client-Id") or (request.client.host if request.client else "anonymous")
+
+def fast_path(query: str) -> Optional[dict]:
+    with observe_stage("fast_path"):
+        return route_fast_path(query)
+
+async def data_query_path(query: str) -> Optional[dict]:
+    """Answer a recognized question about the data straight from Postgres, or None"""
+    matched = match_data_query(query)
+    if matched is None:
+        return None
+    name, data = matched
+    with observe_stage("data_query"):
+        return await answer_query_action(query_action(name, data, ""))
+
+def cache_lookup(query: str, query_embedding) -> Optional[dict]:
+    with observe_stage("cache_lookup"):
+        cached = response_cache.get(query, query_embedding)
+    CACHE_LOOKUPS.labels("miss" if cached is None else "hit").inc()
+    return cached
+
+def to_chat_response(llm_response: dict) -> ChatResponse:
+    """Build a ChatResponse from a raw LLM or fallback result"""
     return ChatResponse(
         action_type=llm_response.get("action_type", "general"),
         target_page=llm_response.get("target_page"),
@@ -45,50 +329,143 @@ async def chat(request: ChatRequest):
         message=llm_response.get("message", "I'm here to help!")
     )
 
+def index_created(background_tasks: BackgroundTasks, resource: str, ids: List[int]):
+    """Add new rows to the semantic entity index after the response is sent.
+
+    The trigram and full-text indexes need nothing: Postgres updates them
+    in the INSERT itself.
+    """
+    if ENTITY_SEMANTIC_SEARCH and ids:
+        background_tasks.add_task(index_entity_ids, resource, ids)
+
+# CRUD endpoints use AsyncSession (asyncpg), so database round trips never
+# block the event loop that also serves /chat
+
 # User endpoints
-@app.get("/api/users", response_model=List[UserResponse])
-async def get_users(db: Session = Depends(get_db)):
-    """Get all users"""
-    users = db.query(User).all()
-    return users
+@app.get("/api/users")
+async def get_users(
+    request: Request,
+    limit: int = DEFAULT_PAGE_SIZE,
+    cursor: Optional[str] = None,
+    order_by: str = "id",
+    name_prefix: Optional[str] = None,
+    phone: Optional[str] = None,
+    email: Optional[str] = None,
+    fields: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db),
+):
+    """List users one keyset page at a time; the next page's cursor is in X-Next-Cursor"""
+    filters = []
+    if name_prefix:
+        filters.append(prefix_filter(User.name, name_prefix))
+    if phone:
+        filters.append(User.phone_number == phone)
+    if email:
+        filters.append(User.email == email)
+    
+    query = build_keyset_query(User, limit=limit, cursor=cursor, order_by=order_by, fields=fields, filters=filters)
+    return await cached_list_page(request, db, "users", query)
 
 @app.post("/api/users", response_model=UserResponse)
-async def create_user(user: UserCreate, db: Session = Depends(get_db)):
+async def create_user(user: UserCreate, background_tasks: BackgroundTasks, db: AsyncSession = Depends(get_async_db)):
     """Create a new user"""
     db_user = User(**user.dict())
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await db.refresh(db_user)
+    await table_changed(db, "users")
+    index_created(background_tasks, "users", [db_user.id])
     return db_user
 
+@app.post("/api/users:bulk", response_model=BulkCreateResponse)
+async def create_users_bulk(request: BulkCreateRequest, background_tasks: BackgroundTasks,
+                            db: AsyncSession = Depends(get_async_db)):
+    """Create many users with multi-row INSERTs (atomic or partial-success)"""
+    result = await bulk_create(db, User, UserCreate, request.items, request.mode)
+    await table_changed(db, "users")
+    index_created(background_tasks, "users", result["ids"])
+    return result
+
 # Role endpoints
-@app.get("/api/roles", response_model=List[RoleResponse])
-async def get_roles(db: Session = Depends(get_db)):
-    """Get all roles"""
-    roles = db.query(Role).all()
-    return roles
+@app.get("/api/roles")
+async def get_roles(
+    request: Request,
+    limit: int = DEFAULT_PAGE_SIZE,
+    cursor: Optional[str] = None,
+    order_by: str = "id",
+    name_prefix: Optional[str] = None,
+    fields: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db),
+):
+    """List roles one keyset page at a time; the next page's cursor is in X-Next-Cursor"""
+    filters = [prefix_filter(Role.name, name_prefix)] if name_prefix else []
+    query = build_keyset_query(Role, limit=limit, cursor=cursor, order_by=order_by, fields=fields, filters=filters)
+    return await cached_list_page(request, db, "roles", query)
 
 @app.post("/api/roles", response_model=RoleResponse)
-async def create_role(role: RoleCreate, db: Session = Depends(get_db)):
+async def create_role(role: RoleCreate, background_tasks: BackgroundTasks, db: AsyncSession = Depends(get_async_db)):
     """Create a new role"""
     db_role = Role(**role.dict())
     db.add(db_role)
-    db.commit()
-    db.refresh(db_role)
+    await db.commit()
+    await db.refresh(db_role)
+    await table_changed(db, "roles")
+    index_created(background_tasks, "roles", [db_role.id])
     return db_role
 
+@app.post("/api/roles:bulk", response_model=BulkCreateResponse)
+async def create_roles_bulk(request: BulkCreateRequest, background_tasks: BackgroundTasks,
+                            db: AsyncSession = Depends(get_async_db)):
+    """Create many roles with multi-row INSERTs (atomic or partial-success)"""
+    result = await bulk_create(db, Role, RoleCreate, request.items, request.mode)
+    await table_changed(db, "roles")
+    index_created(background_tasks, "roles", result["ids"])
+    return result
+
+# Whitelisted aggregate queries behind the "query" chat action
+@app.get("/api/query/{name}")
+async def data_query(name: str, request: Request, db: AsyncSession = Depends(get_async_db)):
+    """Run a whitelisted query; parameters (resource, days, limit, name, phone_number) come from the query string"""
+    return await run_data_query(db, name, dict(request.query_params))
+
+@app.get("/api/search")
+async def entity_search(q: str, resource: Optional[str] = None, limit: int = ENTITY_SEARCH_LIMIT,
+                        db: AsyncSession = Depends(get_async_db)):
+    """Find users and roles by name, phone number or role text, exact matches first"""
+    resources = ("users", "roles") if resource is None else (resource,)
+    if any(name not in ("users", "roles") for name in resources):
+        raise HTTPException(status_code=400, detail="resource must be users or roles")
+    if not 1 <= limit <= 50:
+        raise HTTPException(status_code=400, detail="limit must be between 1 and 50")
+    return await search_entities(db, q, resources, limit)
+
 # Page management endpoints
-@app.get("/api/pages", response_model=List[PageResponse])
-async def get_pages(db: Session = Depends(get_db)):
-    """Get all pages"""
-    pages = db.query(Page).all()
-    return pages
+@app.get("/api/pages")
+async def get_pages(
+    request: Request,
+    limit: int = DEFAULT_PAGE_SIZE,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db),
+):
+    """List pages one keyset page at a time; the next page's cursor is in X-Next-Cursor"""
+    query = build_keyset_query(Page, limit=limit, cursor=cursor, fields=fields)
+    return await cached_list_page(request, db, "pages", query)
 
 @app.post("/api/pages", response_model=PageResponse)
-async def create_page(page: PageCreate, db: Session = Depends(get_db)):
+async def create_page(page: PageCreate, db: AsyncSession = Depends(get_async_db)):
     """Create a new page"""
     db_page = Page(**page.dict())
     db.add(db_page)
-    db.commit()
-    db.refresh(db_page)
+    await notify_pages_changed(db)
+    await db.commit()
+    await db.refresh(db_page)
+    await table_changed(db, "pages")
+    page_catalog.load((await db.execute(select(Page))).scalars().all())
+    response_cache.invalidate()
+    try:
+        # Embedding and the sync Qdrant upsert run off the event loop
+        await run_in_threadpool(index_pages, [db_page])
+    except Exception as e:
+        logger.error("Error indexing page %s: %r", db_page.name, e)
     return db_page
\ No newline at end of file
@@ -0,0 +1,87 @@
+from contextlib import contextmanager
+import os
+import time
+
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+from prometheus_client import multiprocess
+
+# Set by gunicorn.conf.py: each worker writes its values to files here and /metrics sums them
+PROMETHEUS_MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+STAGE_SECONDS = Histogram(
+    "chat_stage_seconds",
+    "Latency of each /chat pipeline stage",
+    ["stage"],
+    buckets=LATENCY_BUCKETS,
+)
+CHAT_REQUESTS = Counter("chat_requests_total", "Chat requests by the path that answered them", ["path"])
+FALLBACKS = Counter("chat_fallback_total", "Keyword fallbacks used instead of retrieval or the LLM", ["kind"])
+CACHE_LOOKUPS = Counter("chat_cache_lookups_total", "Response cache lookups", ["result"])
+JSON_PARSE_FAILURES = Counter("llm_json_parse_failures_total", "LLM outputs that did not contain valid action JSON")
+LLM_TIMEOUTS = Counter("llm_timeouts_total", "Ollama requests that timed out")
+LLM_PROMPT_TOKENS = Counter("llm_prompt_tokens_total", "Prompt tokens evaluated by Ollama (prompt_eval_count)")
+LLM_EVAL_TOKENS = Counter("llm_eval_tokens_total", "Tokens generated by Ollama (eval_count)")
+LLM_TOKENS_PER_SECOND = Histogram(
+    "llm_tokens_per_second",
+    "Generation speed reported by Ollama (eval_count / eval_duration)",
+    buckets=(1, 2, 5, 10, 20, 35, 50, 75, 100, 150, 250),
+)
+LLM_QUEUE_DEPTH = Gauge("llm_queue_depth", "Requests waiting for an Ollama slot", multiprocess_mode="livesum")
+LLM_IN_FLIGHT = Gauge("llm_in_flight", "Requests currently holding an Ollama slot", multiprocess_mode="livesum")
+LLM_QUEUE_WAIT_SECONDS = Histogram(
+    "llm_queue_wait_seconds",
+    "Time spent waiting for an Ollama slot",
+    buckets=LATENCY_BUCKETS,
+)
+LLM_SHED = Counter("llm_shed_total", "Requests answered by fallback instead of being queued for Ollama", ["reason"])
+LLM_TIER_SECONDS = Histogram(
+    "llm_tier_seconds",
+    "Generation latency per model tier of the cascade",
+    ["model"],
+    buckets=LATENCY_BUCKETS,
+)
+LLM_TIER_RESULTS = Counter(
+    "llm_tier_results_total",
+    "Cascade outcomes per model: accepted, rejected (escalated) or unverified (last tier, failed checks)",
+    ["model", "outcome"],
+)
+LLM_ESCALATIONS = Counter("llm_escalations_total", "Reasons a tier's action was not trusted", ["reason"])
+PROBE_SECONDS = Histogram(
+    "dependency_probe_seconds",
+    "Background health probe latency",
+    ["dependency"],
+    buckets=LATENCY_BUCKETS,
+)
+
+@contextmanager
+def observe_stage(stage: str):
+    """Time a block into chat_stage_seconds{stage=...}"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.labels(stage).observe(time.perf_counter() - started)
+
+def record_ollama_stats(data: dict):
+    """Record token counts and Ollama's own timings from a final (done) response"""
+    prompt_tokens = data.get("prompt_eval_count") or 0
+    eval_tokens = data.get("eval_count") or 0
+    LLM_PROMPT_TOKENS.inc(prompt_tokens)
+    LLM_EVAL_TOKENS.inc(eval_tokens)
+    # Ollama reports durations in nanoseconds
+    if data.get("prompt_eval_duration"):
+        STAGE_SECONDS.labels("ollama_prompt_eval").observe(data["prompt_eval_duration"] / 1e9)
+    if data.get("eval_duration"):
+        STAGE_SECONDS.labels("ollama_eval").observe(data["eval_duration"] / 1e9)
+        if eval_tokens:
+            LLM_TOKENS_PER_SECOND.observe(eval_tokens / (data["eval_duration"] / 1e9))
+
+def render_metrics():
+    """Prometheus text exposition of every registered metric, summed over all workers in multiprocess mode"""
+    if PROMETHEUS_MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(), CONTENT_TYPE_LATEST
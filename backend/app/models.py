@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text, JSON
+from sqlalchemy import BigInteger, Column, Integer, String, DateTime, Text, JSON, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.sql import func
 
@@ -9,10 +9,18 @@ class User(Base):
     
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, nullable=False)
-    phone_number = Column(String, nullable=False)
-    email = Column(String, nullable=True)
+    phone_number = Column(String, nullable=False, index=True)
+    email = Column(String, nullable=True, index=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
+    __table_args__ = (
+        # name_prefix filter: lower(name) LIKE 'prefix%'
+        Index("ix_users_name_lower", func.lower(name).label("name_lower"),
+              postgresql_ops={"name_lower": "text_pattern_ops"}),
+        # order_by=created_at keyset pages
+        Index("ix_users_created_at_id", created_at, id),
+    )
+
 class Role(Base):
     __tablename__ = "roles"
     
@@ -22,6 +30,12 @@ class Role(Base):
     permissions = Column(JSON, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
+    __table_args__ = (
+        Index("ix_roles_name_lower", func.lower(name).label("name_lower"),
+              postgresql_ops={"name_lower": "text_pattern_ops"}),
+        Index("ix_roles_created_at_id", created_at, id),
+    )
+
 class Page(Base):
     __tablename__ = "pages"
     
@@ -31,3 +45,11 @@ class Page(Base):
     description = Column(Text, nullable=True)
     api_endpoints = Column(JSON, nullable=True)  # Store GET and POST endpoints
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class TableStat(Base):
+    """Row count and newest created_at per table, kept current by Postgres triggers"""
+    __tablename__ = "table_stats"
+
+    table_name = Column(String, primary_key=True)
+    row_count = Column(BigInteger, nullable=False, default=0)
+    last_created_at = Column(DateTime(timezone=True), nullable=True)
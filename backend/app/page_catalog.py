@@ -0,0 +1,93 @@
+from typing import Dict, Iterable, Optional
+import threading
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.intent_router import rebuild_router
+from app.pg_notify import notify
+
+PAGE_CATALOG_CHANNEL = "page_catalog"
+
+def format_api_endpoints(api_endpoints: Optional[dict]) -> str:
+    """Render the endpoint dict as "GET /api/x (list), POST /api/x (create)" text"""
+    labels = {"get": "list", "post": "create"}
+    return ", ".join(
+        f"{method.upper()} {endpoint} ({labels.get(method.lower(), method.lower())})"
+        for method, endpoint in (api_endpoints or {}).items()
+    )
+
+class PageEntry:
+    """Immutable snapshot of one Page row"""
+
+    __slots__ = ("id", "name", "route", "description", "api_endpoints", "create_endpoint", "context_line")
+
+    def __init__(self, id: Optional[int], name: str, route: str, description: Optional[str], api_endpoints: Optional[dict]):
+        self.id = id
+        self.name = name
+        self.route = route
+        self.description = description or ""
+        self.api_endpoints = dict(api_endpoints or {})
+        self.create_endpoint = self.api_endpoints.get("post")
+        # The line this page contributes to the LLM context
+        self.context_line = (
+            f"- {name}: Frontend route {route} - {self.description}\n"
+            f"  API endpoints: {format_api_endpoints(self.api_endpoints)}"
+        )
+
+    @classmethod
+    def from_page(cls, page) -> "PageEntry":
+        """Build from a Page ORM row or a dict with the same fields"""
+        if isinstance(page, dict):
+            return cls(page.get("id"), page["name"], page["route"], page.get("description"), page.get("api_endpoints"))
+        return cls(page.id, page.name, page.route, page.description, page.api_endpoints)
+
+class PageCatalog:
+    """In-memory, versioned copy of the pages table.
+
+    Everything on the chat path that needs page metadata (retrieval context,
+    the fallback context, action validation, the fast-path router) reads it
+    from here, so no chat request touches the database. load() swaps in a
+    new snapshot atomically and bumps the version; it runs at startup, after
+    POST /api/pages and when another worker announces a change over
+    Postgres NOTIFY.
+    """
+
+    def __init__(self):
+        self.version = 0
+        self._by_name: Dict[str, PageEntry] = {}
+        self._by_route: Dict[str, PageEntry] = {}
+        self._fallback_context = ""
+        self._lock = threading.Lock()
+
+    def load(self, pages: Iterable) -> int:
+        """Replace the catalog with these Page rows (ORM objects or dicts) and rebuild the router"""
+        entries = [PageEntry.from_page(page) for page in pages]
+        by_name = {entry.name: entry for entry in entries}
+        by_route = {entry.route: entry for entry in entries}
+        fallback_context = "\n".join(entry.context_line for entry in entries)
+        with self._lock:
+            self._by_name, self._by_route, self._fallback_context = by_name, by_route, fallback_context
+            self.version += 1
+            version = self.version
+        rebuild_router(entries)
+        return version
+
+    def get(self, name: Optional[str]) -> Optional[PageEntry]:
+        return self._by_name.get(name) if name else None
+
+    def by_route(self, route: Optional[str]) -> Optional[PageEntry]:
+        return self._by_route.get(route) if route else None
+
+    def create_endpoints(self) -> Dict[str, PageEntry]:
+        """Create endpoint (POST) -> page"""
+        return {entry.create_endpoint: entry for entry in self._by_name.values() if entry.create_endpoint}
+
+    def fallback_context(self) -> str:
+        """Context listing every page, used when retrieval is unavailable"""
+        return self._fallback_context
+
+page_catalog = PageCatalog()
+
+async def notify_pages_changed(db: AsyncSession):
+    """Tell other workers to reload the catalog; delivered when db's transaction commits"""
+    await notify(db, PAGE_CATALOG_CHANNEL)
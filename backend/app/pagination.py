@@ -0,0 +1,96 @@
+from datetime import datetime
+from typing import Any, Iterable, List, Optional, Sequence, Tuple
+import base64
+import json
+
+from fastapi import HTTPException
+from sqlalchemy import func, select, tuple_
+from sqlalchemy.sql import Select
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+# order_by -> (cursor key columns, descending)
+ORDERINGS = {
+    "id": (("id",), False),
+    "created_at": (("created_at", "id"), True),
+}
+
+class KeysetQuery:
+    """A built keyset page query plus what is needed to turn its rows into a page"""
+
+    def __init__(self, statement: Select, keys: Sequence[str], fields: Sequence[str], limit: int, order_by: str):
+        self.statement = statement
+        self.keys = keys
+        self.fields = fields
+        self.limit = limit
+        self.order_by = order_by
+
+    def page(self, rows: Sequence[Any]) -> Tuple[List[dict], Optional[str]]:
+        """Split fetched row mappings into (items, next_cursor)"""
+        next_cursor = None
+        if len(rows) > self.limit:
+            rows = rows[:self.limit]
+            last = rows[-1]
+            next_cursor = encode_cursor(self.order_by, [last[key] for key in self.keys])
+        return [{field: row[field] for field in self.fields} for row in rows], next_cursor
+
+def build_keyset_query(model, *, limit: int = DEFAULT_PAGE_SIZE, cursor: Optional[str] = None,
+                       order_by: str = "id", fields: Optional[str] = None,
+                       filters: Iterable = ()) -> KeysetQuery:
+    """Build a column-only (no ORM hydration) keyset page query for a model.
+
+    fields is a comma-separated projection; the cursor keys are always
+    selected so the next cursor can be computed, but only the requested
+    fields are returned.
+    """
+    if order_by not in ORDERINGS:
+        raise HTTPException(status_code=400, detail=f"order_by must be one of {sorted(ORDERINGS)}")
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {MAX_PAGE_SIZE}")
+    keys, descending = ORDERINGS[order_by]
+
+    columns = model.__table__.columns
+    if fields:
+        output_fields = [field.strip() for field in fields.split(",") if field.strip()]
+        unknown = [field for field in output_fields if field not in columns]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    else:
+        output_fields = [column.name for column in columns]
+    selected = list(dict.fromkeys(list(output_fields) + list(keys)))
+
+    key_columns = [columns[key] for key in keys]
+    statement = select(*(columns[name] for name in selected)).where(*filters)
+    if cursor:
+        values = decode_cursor(cursor, order_by)
+        if descending:
+            statement = statement.where(tuple_(*key_columns) < tuple_(*values))
+        else:
+            statement = statement.where(tuple_(*key_columns) > tuple_(*values))
+    statement = statement.order_by(*(column.desc() if descending else column.asc() for column in key_columns))
+    # One extra row tells whether there is a next page
+    statement = statement.limit(limit + 1)
+    return KeysetQuery(statement, keys, output_fields, limit, order_by)
+
+def prefix_filter(column, prefix: str):
+    """Case-insensitive prefix match that can use a lower(column) text_pattern_ops index"""
+    escaped = prefix.lower().replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return func.lower(column).like(f"{escaped}%", escape="\\")
+
+def encode_cursor(order_by: str, values: List[Any]) -> str:
+    encoded = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    raw = json.dumps({"o": order_by, "k": encoded}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor: str, order_by: str) -> List[Any]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        data = json.loads(raw)
+        keys, _ = ORDERINGS[data["o"]]
+        values = list(data["k"])
+        if data["o"] != order_by or len(values) != len(keys):
+            raise ValueError("cursor does not match order_by")
+        return [datetime.fromisoformat(value) if key == "created_at" else value for key, value in zip(keys, values)]
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
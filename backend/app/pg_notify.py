@@ -0,0 +1,105 @@
+from typing import Awaitable, Callable, Dict, List, Optional
+import asyncio
+import logging
+import os
+import uuid
+
+from sqlalchemy import text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession
+
+logger = logging.getLogger(__name__)
+
+PG_LISTEN_RECONNECT_SECONDS = float(os.getenv("PG_LISTEN_RECONNECT_SECONDS", "5"))
+# Identifies this worker's own notifications, which it has already applied.
+# Read through the module at send/receive time: forked workers replace it.
+WORKER_ID = uuid.uuid4().hex
+
+def new_worker_id():
+    """Give this process its own sender id; workers forked from a preloaded master must call it"""
+    global WORKER_ID
+    WORKER_ID = uuid.uuid4().hex
+
+Handler = Callable[[str], Awaitable[None]]
+
+async def notify(db: AsyncSession, channel: str, payload: str = ""):
+    """Queue a notification for other workers; it is delivered when db's transaction commits"""
+    await db.execute(text("SELECT pg_notify(:channel, :payload)"), {"channel": channel, "payload": f"{WORKER_ID}:{payload}"})
+
+class PgListener:
+    """LISTENs on a dedicated asyncpg connection and dispatches other workers' notifications.
+
+    Handlers get the payload without the sender prefix. Notifications are lost
+    while not listening, so every (re)connect calls the on_connect handlers,
+    which should reload whatever the channels would have announced.
+    """
+
+    def __init__(self, database_url: str):
+        url = make_url(database_url)
+        self.enabled = url.get_backend_name() == "postgresql"
+        self.dsn = url.set(drivername="postgresql").render_as_string(hide_password=False)
+        self._handlers: Dict[str, List[Handler]] = {}
+        self._on_connect: List[Callable[[], Awaitable[None]]] = []
+        self._task: Optional[asyncio.Task] = None
+        self._pending: set = set()
+
+    def subscribe(self, channel: str, handler: Handler, on_connect: Optional[Callable[[], Awaitable[None]]] = None):
+        self._handlers.setdefault(channel, []).append(handler)
+        if on_connect is not None:
+            self._on_connect.append(on_connect)
+
+    def start(self):
+        if self.enabled and self._handlers and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        import asyncpg
+
+        while True:
+            closed = asyncio.Event()
+            try:
+                connection = await asyncpg.connect(self.dsn)
+            except Exception as e:
+                logger.warning("LISTEN connection failed: %r", e)
+                await asyncio.sleep(PG_LISTEN_RECONNECT_SECONDS)
+                continue
+            try:
+                connection.add_termination_listener(lambda _: closed.set())
+                for channel in self._handlers:
+                    await connection.add_listener(channel, self._on_notify)
+                for on_connect in self._on_connect:
+                    self._spawn(on_connect())
+                await closed.wait()
+                logger.warning("LISTEN connection lost, reconnecting")
+            finally:
+                if not connection.is_closed():
+                    await connection.close()
+            await asyncio.sleep(PG_LISTEN_RECONNECT_SECONDS)
+
+    def _on_notify(self, connection, pid, channel, payload):
+        sender, _, message = payload.partition(":")
+        if sender == WORKER_ID:
+            return
+        for handler in self._handlers.get(channel, []):
+            self._spawn(handler(message))
+
+    def _spawn(self, coroutine):
+        task = asyncio.create_task(self._guard(coroutine))
+        # Keep a reference until it finishes so the task is not garbage collected
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    async def _guard(self, coroutine):
+        try:
+            await coroutine
+        except Exception as e:
+            logger.error("NOTIFY handler failed: %r", e)
@@ -1,133 +1,258 @@
-from qdrant_client import QdrantClient
-from qdrant_client.http.models import Distance, VectorParams, PointStruct
-from sentence_transformers import SentenceTransformer
-import uuid
+from qdrant_client import QdrantClient, AsyncQdrantClient
+from qdrant_client.http.models import Distance, VectorParams, PointStruct, PointIdsList
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, List, Optional
+import hashlib
+import logging
+import os
+import threading
 import time
 
-# Initialize clients
-client = QdrantClient(host="qdrant", port=6333)
-model = SentenceTransformer('all-MiniLM-L6-v2')
+from app.health import qdrant_breaker
+from app.embedding_service import EmbeddingService
+from app.startup_profile import startup_profile
+from app.embedding_backends import EMBEDDING_BACKEND, EMBEDDING_DIMENSION, EmbeddingBackend, create_backend
+from app.metrics import FALLBACKS, observe_stage
+from app.page_catalog import format_api_endpoints, page_catalog
+
+logger = logging.getLogger(__name__)
+
+QDRANT_HOST = os.getenv("QDRANT_HOST", "qdrant")
+QDRANT_PORT = int(os.getenv("QDRANT_PORT", "6333"))
+EMBED_MAX_WORKERS = int(os.getenv("EMBED_MAX_WORKERS", "2"))
+# Retrieved pages are added to the LLM context in score order until this many
+# (estimated) tokens are used, out of at most QDRANT_SEARCH_LIMIT candidates
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "160"))
+QDRANT_SEARCH_LIMIT = int(os.getenv("QDRANT_SEARCH_LIMIT", "8"))
+
+# Clients and the embedding backend are created on first use, so importing this module
+# (app.main, seed_data, tests) neither loads torch nor needs Qdrant reachable
+_client: Optional[QdrantClient] = None
+_async_client: Optional[AsyncQdrantClient] = None
+_backend: Optional[EmbeddingBackend] = None
+_init_lock = threading.Lock()
+
+def get_client() -> QdrantClient:
+    global _client
+    if _client is None:
+        with _init_lock:
+            if _client is None:
+                _client = QdrantClient(host=QDRANT_HOST, port=QDRANT_PORT)
+    return _client
+
+def get_async_client() -> AsyncQdrantClient:
+    global _async_client
+    if _async_client is None:
+        with _init_lock:
+            if _async_client is None:
+                _async_client = AsyncQdrantClient(host=QDRANT_HOST, port=QDRANT_PORT)
+    return _async_client
+
+def get_embedding_backend() -> EmbeddingBackend:
+    """Load the EMBEDDING_BACKEND model once, thread-safely"""
+    global _backend
+    if _backend is None:
+        with _init_lock:
+            if _backend is None:
+                with startup_profile.stage("model_load"):
+                    _backend = create_backend(EMBEDDING_BACKEND)
+    return _backend
+
+def warm_up_model():
+    """Load the model and run one encode so the first query pays no start-up cost"""
+    with startup_profile.stage("model_warm_up"):
+        encode_batch(["warm up"])
+
+# Encoding is CPU-bound, so it runs on a small dedicated pool instead of the
+# event loop (or the default executor shared with the sync CRUD routes)
+embed_executor = ThreadPoolExecutor(max_workers=EMBED_MAX_WORKERS, thread_name_prefix="embed")
+
+def encode_batch(texts: List[str]):
+    """One batched forward pass over texts"""
+    return get_embedding_backend().encode(texts)
+
+embedding_service = EmbeddingService(encode_batch, embed_executor)
 
 COLLECTION_NAME = "dashboard_pages"
 
-def initialize_qdrant():
-    """Initialize Qdrant collection and populate with page data"""
+def initialize_qdrant(pages: Iterable):
+    """Bring the Qdrant page index in sync with the Page table"""
     try:
         # Wait for Qdrant to be ready
         max_retries = 5
         for i in range(max_retries):
             try:
-                client.get_collections()
-                print("Qdrant is ready")
+                collections = get_client().get_collections().collections
+                logger.info("Qdrant is ready")
                 break
             except Exception as e:
-                print(f"Waiting for Qdrant to be ready... (attempt {i+1}/{max_retries})")
+                logger.info("Waiting for Qdrant to be ready... (attempt %d/%d)", i + 1, max_retries)
                 time.sleep(2)
                 if i == max_retries - 1:
                     raise e
         
-        # First, try to delete the collection if it exists to start fresh
-        try:
-            client.delete_collection(collection_name=COLLECTION_NAME)
-            print(f"Deleted existing collection: {COLLECTION_NAME}")
-            time.sleep(1)
-        except Exception:
-            print(f"Collection {COLLECTION_NAME} didn't exist or couldn't be deleted")
-
-        # Create fresh collection
-        client.create_collection(
-            collection_name=COLLECTION_NAME,
-            vectors_config=VectorParams(size=384, distance=Distance.COSINE),
-        )
-        print(f"Created Qdrant collection: {COLLECTION_NAME}")
-
-        # Add page information using simple integers
-        pages_data = [
-            {
-                "id": 1,
-                "name": "users",
-                "route": "/users",  # Frontend route
-                "description": "Manage users, view user list, create new users",
-                "api_endpoints": "GET /api/users (list), POST /api/users (create)"
-            },
-            {
-                "id": 2, 
-                "name": "roles",
-                "route": "/roles",  # Frontend route
-                "description": "Manage roles and permissions, create new roles",
-                "api_endpoints": "GET /api/roles (list), POST /api/roles (create)"
-            }
-        ]
-
-        for page in pages_data:
-            # Create text for embedding
-            text = f"{page['name']} page: {page['description']} - Frontend route: {page['route']} - API endpoints: {page['api_endpoints']}"
-            
-            # Generate embedding
-            embedding = model.encode(text).tolist()
-            
-            # Create point
-            point = PointStruct(
-                id=page["id"],
-                vector=embedding,
-                payload=page
+        # Keep the existing collection; only create it on first boot
+        if not any(col.name == COLLECTION_NAME for col in collections):
+            get_client().create_collection(
+                collection_name=COLLECTION_NAME,
+                vectors_config=VectorParams(size=EMBEDDING_DIMENSION, distance=Distance.COSINE),
             )
-            
-            # Add to collection
-            try:
-                client.upsert(
-                    collection_name=COLLECTION_NAME,
-                    points=[point]
-                )
-                print(f"Successfully added point for {page['name']}")
-            except Exception as e:
-                print(f"Error adding point for {page['name']}: {e}")
+            logger.info("Created Qdrant collection: %s", COLLECTION_NAME)
         
-        print(f"Qdrant initialization completed")
+        sync_pages(pages)
+        logger.info("Qdrant initialization completed")
         
     except Exception as e:
-        print(f"Error initializing Qdrant: {e}")
-        print("Qdrant initialization failed, but the application will continue with limited search capabilities")
+        logger.error("Qdrant initialization failed, continuing with limited search capabilities: %r", e)
+
+def sync_pages(pages: Iterable):
+    """Re-embed new or changed pages and drop deleted ones, based on content hashes"""
+    payloads = [page_payload(page) for page in pages]
+    
+    indexed = {}
+    offset = None
+    while True:
+        points, offset = get_client().scroll(
+            collection_name=COLLECTION_NAME,
+            limit=256,
+            offset=offset,
+            with_payload=["content_hash"],
+            with_vectors=False,
+        )
+        for point in points:
+            indexed[point.id] = (point.payload or {}).get("content_hash")
+        if offset is None:
+            break
+    
+    changed = [payload for payload in payloads if indexed.get(payload["id"]) != payload["content_hash"]]
+    upsert_payloads(changed)
+    
+    stale = set(indexed) - {payload["id"] for payload in payloads}
+    if stale:
+        get_client().delete(
+            collection_name=COLLECTION_NAME,
+            points_selector=PointIdsList(points=list(stale)),
+        )
+    logger.info("Qdrant page index synced: %d embedded, %d removed, %d unchanged",
+                len(changed), len(stale), len(payloads) - len(changed))
+
+def index_pages(pages: Iterable):
+    """Embed and upsert pages right away (e.g. after POST /api/pages)"""
+    upsert_payloads([page_payload(page) for page in pages])
+
+def upsert_payloads(payloads: List[dict]):
+    """Embed page payloads in one batch and upsert them in one call"""
+    if not payloads:
+        return
+    embeddings = encode_batch([page_text(payload) for payload in payloads])
+    get_client().upsert(
+        collection_name=COLLECTION_NAME,
+        points=[
+            PointStruct(id=payload["id"], vector=embedding.tolist(), payload=payload)
+            for payload, embedding in zip(payloads, embeddings)
+        ],
+    )
+
+def page_payload(page) -> dict:
+    """Qdrant payload for a Page row, including a hash of its indexed content"""
+    payload = {
+        "id": page.id,
+        "name": page.name,
+        "route": page.route,
+        "description": page.description or "",
+        "api_endpoints": format_api_endpoints(page.api_endpoints),
+    }
+    # The backend is part of the hash so switching EMBEDDING_BACKEND re-embeds every page
+    hashed = f"{EMBEDDING_BACKEND}\n{page_text(payload)}"
+    payload["content_hash"] = hashlib.sha256(hashed.encode("utf-8")).hexdigest()
+    return payload
+
+def page_text(payload: dict) -> str:
+    """Text that is embedded for a page"""
+    return f"{payload['name']} page: {payload['description']} - Frontend route: {payload['route']} - API endpoints: {payload['api_endpoints']}"
+
+async def embed_query(query: str) -> List[float]:
+    """Encode a query on the embedding pool without blocking the event loop"""
+    return await embedding_service.embed(query)
 
-def search_qdrant(query: str, limit: int = 5) -> str:
-    """Search for relevant pages based on query"""
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about 4 characters per token for English BPE vocabularies)"""
+    return len(text) // 4 + 1
+
+def fit_to_budget(lines: List[str], token_budget: int) -> List[str]:
+    """Keep lines in order while they fit the budget (the first one always does)"""
+    kept, used = [], 0
+    for line in lines:
+        tokens = estimate_tokens(line)
+        if kept and used + tokens > token_budget:
+            break
+        kept.append(line)
+        used += tokens
+    return kept
+
+async def search_qdrant(query: str, limit: int = QDRANT_SEARCH_LIMIT, query_embedding: Optional[List[float]] = None,
+                        token_budget: int = CONTEXT_TOKEN_BUDGET) -> str:
+    """Search for relevant pages based on query (reusing query_embedding if given)"""
+    # Availability (including whether the collection exists) is tracked by the
+    # background health monitor, so the hot path makes no extra round trip
+    if not qdrant_breaker.allow_request():
+        return get_fallback_context()
+    
     try:
-        # Check if collection exists
-        collections = client.get_collections().collections
-        if not any(col.name == COLLECTION_NAME for col in collections):
-            print(f"Collection {COLLECTION_NAME} does not exist, using fallback")
-            return get_fallback_context()
-        
         # Generate embedding for query
-        query_embedding = model.encode(query).tolist()
+        if query_embedding is None:
+            with observe_stage("embed"):
+                query_embedding = await embed_query(query)
         
         # Search in Qdrant
-        search_results = client.search(
-            collection_name=COLLECTION_NAME,
-            query_vector=query_embedding,
-            limit=limit
-        )
+        try:
+            with observe_stage("qdrant_search"):
+                # query_points replaces search(), which current qdrant-client releases no longer have
+                search_results = (await get_async_client().query_points(
+                    collection_name=COLLECTION_NAME,
+                    query=query_embedding,
+                    limit=limit,
+                    with_payload=["name"],
+                )).points
+            qdrant_breaker.record_success()
+        except Exception as e:
+            qdrant_breaker.record_failure(e)
+            raise
         
-        if not search_results:
+        # Page metadata comes from the catalog, so the context never shows a
+        # stale payload and pages deleted since indexing are skipped
+        entries = [page_catalog.get(result.payload.get("name")) for result in search_results]
+        context_parts = [entry.context_line for entry in entries if entry is not None]
+        if not context_parts:
             return get_fallback_context()
         
-        # Format results for LLM context
-        context_parts = []
-        for result in search_results:
-            payload = result.payload
-            context_parts.append(
-                f"- {payload['name']}: Frontend route {payload['route']} - {payload['description']}\n  API endpoints: {payload['api_endpoints']}"
-            )
-        
-        return "\n".join(context_parts)
+        # Best match first, within the token budget
+        return "\n".join(fit_to_budget(context_parts, token_budget))
         
     except Exception as e:
-        print(f"Error searching Qdrant: {e}")
+        logger.warning("Error searching Qdrant: %r", e)
         return get_fallback_context()
 
+async def probe_qdrant():
+    """Health probe: Qdrant answers and the pages collection exists"""
+    collections = (await get_async_client().get_collections()).collections
+    if not any(col.name == COLLECTION_NAME for col in collections):
+        raise RuntimeError(f"Collection {COLLECTION_NAME} does not exist")
+
+async def close_qdrant():
+    """Release the async Qdrant connection pool and the embedding workers"""
+    if _async_client is not None:
+        await _async_client.close()
+    embed_executor.shutdown(wait=False)
+
+def close_sync_client():
+    """Drop the sync client (used by startup indexing) so a forked worker opens its own"""
+    global _client
+    if _client is not None:
+        _client.close()
+        _client = None
+
 def get_fallback_context() -> str:
-    """Fallback context when Qdrant is not available"""
-    return """- users: Frontend route /users - Manage users, view user list, create new users
-  API endpoints: GET /api/users (list), POST /api/users (create)
-- roles: Frontend route /roles - Manage roles and permissions, create new roles
-  API endpoints: GET /api/roles (list), POST /api/roles (create)"""
\ No newline at end of file
+    """Fallback context when Qdrant is not available: every page in the catalog"""
+    FALLBACKS.labels("context").inc()
+    return page_catalog.fallback_context()
\ No newline at end of file
@@ -0,0 +1,164 @@
+from collections import OrderedDict
+from typing import List, Optional
+import copy
+import os
+import threading
+import time
+
+import numpy as np
+
+from app.intent_router import extract_entities, required_fields
+
+CHAT_CACHE_MAX_ENTRIES = int(os.getenv("CHAT_CACHE_MAX_ENTRIES", "512"))
+CHAT_CACHE_TTL_SECONDS = float(os.getenv("CHAT_CACHE_TTL_SECONDS", "600"))
+CHAT_CACHE_SIMILARITY = float(os.getenv("CHAT_CACHE_SIMILARITY", "0.92"))
+
+def normalize_query(query: str) -> str:
+    """Normalize a query for the exact-match layer"""
+    return " ".join(query.lower().split()).rstrip("?!.")
+
+class _Entry:
+    __slots__ = ("response", "vector", "expires_at")
+
+    def __init__(self, response: dict, vector: Optional[np.ndarray], expires_at: float):
+        self.response = response
+        self.vector = vector
+        self.expires_at = expires_at
+
+class ResponseCache:
+    """Two-layer LLM response cache in front of query_ollama.
+
+    The exact layer is keyed on the normalized query. The semantic layer
+    compares the query embedding (the one already computed for the Qdrant
+    search) against cached entries and returns the closest one above the
+    cosine threshold; query actions are left out of it. Entries expire after a TTL and the least recently used
+    one is evicted once the cache is full.
+    """
+
+    def __init__(self, max_entries: int = CHAT_CACHE_MAX_ENTRIES,
+                 ttl_seconds: float = CHAT_CACHE_TTL_SECONDS,
+                 similarity_threshold: float = CHAT_CACHE_SIMILARITY):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._matrix: Optional[np.ndarray] = None
+        self._matrix_keys: List[str] = []
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, query: str, embedding: Optional[List[float]] = None) -> Optional[dict]:
+        """Return a cached response adapted to this query, or None"""
+        key = normalize_query(query)
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.exact_hits += 1
+                return copy.deepcopy(entry.response)
+
+            if embedding is not None:
+                match = self._nearest(_unit(embedding))
+                if match is not None:
+                    adapted = _adapt_to_query(self._entries[match].response, query)
+                    if adapted is not None:
+                        self._entries.move_to_end(match)
+                        self.semantic_hits += 1
+                        return adapted
+
+            self.misses += 1
+            return None
+
+    def put(self, query: str, embedding: Optional[List[float]], response: dict):
+        """Cache a response for a query"""
+        # Keyword fallback answers (Ollama down, shed or timed out), answers
+        # that failed the cascade's checks and "general" replies are never
+        # pinned in the cache
+        if response.get("fallback") or response.get("unverified") or response.get("action_type") in (None, "general"):
+            return
+        # Bulk creates carry a list of rows that cannot be re-extracted from a new query
+        if str((response.get("api_call") or {}).get("endpoint", "")).endswith(":bulk"):
+            return
+        key = normalize_query(query)
+        vector = _unit(embedding) if embedding is not None else None
+        # A data query's days/limit/name cannot be carried over to a similar
+        # question ("last 30 days" vs "last 3 days"): exact matches only
+        if response.get("action_type") == "query":
+            vector = None
+        with self._lock:
+            self._entries[key] = _Entry(copy.deepcopy(response), vector, time.monotonic() + self.ttl_seconds)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+            self._matrix = None
+
+    def invalidate(self):
+        """Drop every cached response (e.g. after the page set changed)"""
+        with self._lock:
+            self._entries.clear()
+            self._matrix = None
+
+    def stats(self) -> dict:
+        """Hit/miss counters for the cache"""
+        with self._lock:
+            lookups = self.exact_hits + self.semantic_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "exact_hits": self.exact_hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": (self.exact_hits + self.semantic_hits) / lookups if lookups else 0.0,
+            }
+
+    def _expire(self, now: float):
+        expired = [key for key, entry in self._entries.items() if entry.expires_at <= now]
+        for key in expired:
+            del self._entries[key]
+        if expired:
+            self._matrix = None
+
+    def _nearest(self, vector: np.ndarray) -> Optional[str]:
+        if self._matrix is None:
+            self._matrix_keys = [key for key, entry in self._entries.items() if entry.vector is not None]
+            if self._matrix_keys:
+                self._matrix = np.stack([self._entries[key].vector for key in self._matrix_keys])
+        if self._matrix is None:
+            return None
+        scores = self._matrix @ vector
+        best = int(np.argmax(scores))
+        if scores[best] < self.similarity_threshold:
+            return None
+        return self._matrix_keys[best]
+
+def _unit(embedding: List[float]) -> np.ndarray:
+    vector = np.asarray(embedding, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+def _adapt_to_query(response: dict, query: str) -> Optional[dict]:
+    """Copy a semantically matched response for a new query, or None if it cannot be reused.
+
+    A create carries the cached query's entities, so they are re-extracted
+    from the new query; when a required field is missing the LLM has to
+    answer instead.
+    """
+    response = copy.deepcopy(response)
+    api_call = response.get("api_call")
+    if response.get("action_type") == "create" and isinstance(api_call, dict):
+        resource = response.get("target_page") or ""
+        data = extract_entities(query, resource)
+        if not all(field in data for field in required_fields(resource)):
+            return None
+        api_call["data"] = data
+        singular = resource.rstrip("s")
+        response["message"] = f"Creating new {singular} {data['name']}" if "name" in data else f"Creating new {singular}"
+    return response
+
+response_cache = ResponseCache()
@@ -1,14 +1,17 @@
 from pydantic import BaseModel
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Literal
 from datetime import datetime
 
 class ChatRequest(BaseModel):
     query: str
 
 class ChatResponse(BaseModel):
-    action_type: str  # "navigate", "create", "show", "general"
+    action_type: str  # "navigate", "create", "show", "query", "general"
     target_page: Optional[str] = None
     route: Optional[str] = None
+    # {"method", "endpoint", "data"}; creating several rows at once uses the
+    # "<collection>:bulk" endpoint with data {"items": [...]}; a "query" action
+    # names a whitelisted /api/query/<name> with its parameters as data
     api_call: Optional[Dict[str, Any]] = None
     message: str
 
@@ -48,4 +51,19 @@ class PageResponse(BaseModel):
     route: str
     description: Optional[str]
     api_endpoints: Optional[Dict[str, Any]]
-    created_at: datetime
\ No newline at end of file
+    created_at: datetime
+
+class BulkCreateRequest(BaseModel):
+    # Rows are validated one by one so partial mode can report per-row errors
+    items: List[Dict[str, Any]]
+    # "atomic": all rows or none; "partial": insert valid rows, report the rest
+    mode: Literal["atomic", "partial"] = "atomic"
+
+class BulkRowError(BaseModel):
+    index: int
+    error: str
+
+class BulkCreateResponse(BaseModel):
+    created: int
+    ids: List[int]
+    errors: List[BulkRowError]
@@ -1,6 +1,30 @@
 from sqlalchemy.orm import Session
 from app.database import SessionLocal
 from app.models import Page
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PAGES = [
+    {
+        "name": "users",
+        "route": "/users",
+        "description": "Manage users, view user list, create new users",
+        "api_endpoints": {
+            "get": "/api/users",
+            "post": "/api/users"
+        }
+    },
+    {
+        "name": "roles",
+        "route": "/roles", 
+        "description": "Manage roles and permissions, create new roles",
+        "api_endpoints": {
+            "get": "/api/roles",
+            "post": "/api/roles"
+        }
+    }
+]
 
 def seed_pages():
     """Seed the database with initial page data"""
@@ -8,39 +32,18 @@ def seed_pages():
     try:
         # Check if pages already exist
         if db.query(Page).count() > 0:
-            print("Pages already exist, skipping seed")
+            logger.info("Pages already exist, skipping seed")
             return
         
-        pages_data = [
-            {
-                "name": "users",
-                "route": "/users",
-                "description": "Manage users, view user list, create new users",
-                "api_endpoints": {
-                    "get": "/api/users",
-                    "post": "/api/users"
-                }
-            },
-            {
-                "name": "roles",
-                "route": "/roles", 
-                "description": "Manage roles and permissions, create new roles",
-                "api_endpoints": {
-                    "get": "/api/roles",
-                    "post": "/api/roles"
-                }
-            }
-        ]
-        
-        for page_data in pages_data:
+        for page_data in DEFAULT_PAGES:
             page = Page(**page_data)
             db.add(page)
         
         db.commit()
-        print("Successfully seeded pages data")
+        logger.info("Successfully seeded pages data")
         
     except Exception as e:
-        print(f"Error seeding pages: {e}")
+        logger.error("Error seeding pages: %r", e)
         db.rollback()
     finally:
         db.close()
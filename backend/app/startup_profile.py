@@ -0,0 +1,47 @@
+from collections import OrderedDict
+from contextlib import contextmanager
+import json
+import time
+
+class StartupProfile:
+    """Wall-clock timings of the cold-start stages of one worker.
+
+    Stages can nest (model_load happens inside index when pages changed),
+    so the values are not meant to be summed.
+    """
+
+    def __init__(self):
+        self.stages: "OrderedDict[str, float]" = OrderedDict()
+        self.ready = False
+
+    def record(self, name: str, seconds: float):
+        self.stages[name] = round(seconds, 4)
+
+    @contextmanager
+    def stage(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - started)
+
+    def as_dict(self) -> dict:
+        return {
+            "ready": self.ready,
+            "stages": dict(self.stages),
+        }
+
+startup_profile = StartupProfile()
+
+def main():
+    """Run the backend cold start in-process and print the stage timings as JSON"""
+    import app.main
+    # Use the instance app.main recorded into, not this __main__ module's copy
+    from app.startup_profile import startup_profile as profile
+
+    app.main.prepare_data(warm_up=True)
+    profile.ready = True
+    print(json.dumps(profile.as_dict(), indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+import json
+from typing import Dict
+
+class IncrementalActionParser:
+    """Incrementally scan streamed LLM text for the action JSON object.
+
+    Top-level string fields (action_type, target_page, route, message) are
+    reported as soon as their closing quote arrives, so callers can act on
+    them before the rest of the object has been generated. Text before the
+    first '{' is ignored and scanning stops once that object closes.
+    """
+
+    def __init__(self):
+        self.fields: Dict[str, str] = {}
+        self.complete = False
+        self._chars = []
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        self._expect_key = True
+        self._key = None
+
+    @property
+    def text(self) -> str:
+        """The JSON object text seen so far"""
+        return "".join(self._chars)
+
+    def feed(self, chunk: str) -> Dict[str, str]:
+        """Consume a chunk and return the top-level string fields it completed"""
+        completed = {}
+        for char in chunk:
+            if self.complete:
+                break
+            if self._depth == 0:
+                if char != "{":
+                    continue
+                self._depth = 1
+                self._chars.append(char)
+                continue
+
+            self._chars.append(char)
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    if self._depth == 1:
+                        self._on_string(completed)
+                continue
+
+            if char == '"':
+                self._in_string = True
+                self._string_start = len(self._chars) - 1
+            elif char in "{[":
+                self._depth += 1
+            elif char in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    self.complete = True
+            elif self._depth == 1 and char == ":":
+                self._expect_key = False
+            elif self._depth == 1 and char == ",":
+                self._expect_key = True
+        return completed
+
+    def _on_string(self, completed: Dict[str, str]):
+        raw = "".join(self._chars[self._string_start:])
+        try:
+            value = json.loads(raw)
+        except json.JSONDecodeError:
+            return
+        if self._expect_key:
+            self._key = value
+        elif self._key is not None:
+            self.fields[self._key] = value
+            completed[self._key] = value
+            self._key = None
+
+    def result(self) -> dict:
+        """Parse the completed object, raising json.JSONDecodeError if it is not valid"""
+        return json.loads(self.text)
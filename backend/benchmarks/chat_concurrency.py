@@ -0,0 +1,125 @@
+"""Measure /api/users latency while /chat is saturated.
+
+Runs two phases against a live backend:
+  1. idle:      probe GET /api/users on its own
+  2. saturated: probe GET /api/users while N callers hammer POST /chat
+
+If the chat pipeline blocks the event loop, the p99 of the saturated phase
+climbs towards the LLM latency; with the async pipeline it should stay flat.
+
+The chat queries below are all answered by the fast path or, on repeats,
+the response cache unless the backend runs with both turned off, so start
+it with FAST_PATH_MIN_CONFIDENCE=2 CHAT_CACHE_MAX_ENTRIES=0. The script
+reports which paths answered the saturated phase (from /metrics) and
+warns when it was not the LLM.
+
+Usage:
+    FAST_PATH_MIN_CONFIDENCE=2 CHAT_CACHE_MAX_ENTRIES=0 uvicorn app.main:app --port 8050 &
+    python benchmarks/chat_concurrency.py --base-url http://localhost:8050 \\
+        --chat-concurrency 32 --duration 20
+"""
+import argparse
+import asyncio
+import re
+import statistics
+import time
+
+import httpx
+
+CHAT_QUERIES = [
+    "show me users",
+    "go to roles page",
+    "create user with name John and phone 123456",
+    "what can I do here?",
+]
+
+
+def percentile(samples, pct):
+    if not samples:
+        return float("nan")
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def probe_users(client, stop_at, interval, samples):
+    while time.perf_counter() < stop_at:
+        started = time.perf_counter()
+        response = await client.get("/api/users")
+        response.raise_for_status()
+        samples.append((time.perf_counter() - started) * 1000)
+        await asyncio.sleep(interval)
+
+
+async def chat_caller(client, stop_at, worker_id, completed):
+    i = worker_id
+    while time.perf_counter() < stop_at:
+        query = CHAT_QUERIES[i % len(CHAT_QUERIES)]
+        i += 1
+        try:
+            await client.post("/chat", json={"query": query})
+            completed.append(1)
+        except httpx.HTTPError:
+            pass
+
+
+async def run_phase(base_url, duration, interval, chat_concurrency):
+    samples = []
+    completed = []
+    limits = httpx.Limits(max_connections=chat_concurrency + 4)
+    async with httpx.AsyncClient(base_url=base_url, timeout=60, limits=limits) as client:
+        stop_at = time.perf_counter() + duration
+        tasks = [probe_users(client, stop_at, interval, samples)]
+        tasks += [chat_caller(client, stop_at, i, completed) for i in range(chat_concurrency)]
+        await asyncio.gather(*tasks)
+    return samples, len(completed)
+
+
+CHAT_REQUESTS_SAMPLE = re.compile(r'^chat_requests_total\{path="(\w+)"\} ([\d.e+]+)$', re.MULTILINE)
+
+
+async def chat_paths(base_url):
+    """chat_requests_total per answering path, from the backend's /metrics"""
+    async with httpx.AsyncClient(base_url=base_url, timeout=10) as client:
+        response = await client.get("/metrics")
+        response.raise_for_status()
+    return {path: float(value) for path, value in CHAT_REQUESTS_SAMPLE.findall(response.text)}
+
+
+def report(label, samples, chat_completed, duration):
+    print(
+        f"{label:<10} n={len(samples):<5} "
+        f"p50={percentile(samples, 50):8.1f}ms "
+        f"p99={percentile(samples, 99):8.1f}ms "
+        f"mean={statistics.fmean(samples) if samples else float('nan'):8.1f}ms "
+        f"chat/s={chat_completed / duration:6.2f}"
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--base-url", default="http://localhost:8050")
+    parser.add_argument("--chat-concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds per phase")
+    parser.add_argument("--probe-interval", type=float, default=0.05)
+    args = parser.parse_args()
+
+    idle, _ = await run_phase(args.base_url, args.duration, args.probe_interval, 0)
+    report("idle", idle, 0, args.duration)
+
+    before = await chat_paths(args.base_url)
+    saturated, chat_completed = await run_phase(
+        args.base_url, args.duration, args.probe_interval, args.chat_concurrency
+    )
+    report("saturated", saturated, chat_completed, args.duration)
+
+    after = await chat_paths(args.base_url)
+    answered = {path: after[path] - before.get(path, 0) for path in after if after[path] > before.get(path, 0)}
+    print("chat answered by: " + ", ".join(f"{path}={count:.0f}" for path, count in sorted(answered.items())))
+    if set(answered) - {"llm"}:
+        print("warning: not every chat request reached the LLM; start the backend with "
+              "FAST_PATH_MIN_CONFIDENCE=2 CHAT_CACHE_MAX_ENTRIES=0")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
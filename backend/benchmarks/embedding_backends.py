@@ -0,0 +1,130 @@
+"""Compare embedding backends: latency, RSS and retrieval agreement.
+
+Each backend runs in its own subprocess so its resident memory is measured
+in isolation. The parent then ranks a document corpus for every query with
+each backend and reports the top-k overlap against the reference
+sentence-transformers model.
+
+Usage:
+    python benchmarks/embedding_backends.py [--backends sentence-transformers onnx] [--k 3]
+
+The onnx backend needs `pip install -r requirements-onnx.txt` and an
+exported model (`python -m app.embedding_backends export --output DIR`,
+then ONNX_MODEL_DIR=DIR).
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+BACKEND_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, BACKEND_ROOT)
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+REFERENCE = "sentence-transformers"
+
+
+def read_lines(name):
+    with open(os.path.join(DATA_DIR, name)) as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def rss_mb():
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return float("nan")
+
+
+def run_child(backend_name, output_path, repeats):
+    from app.embedding_backends import create_backend
+
+    queries = read_lines("query_log.txt")
+    documents = read_lines("retrieval_corpus.txt")
+
+    baseline_rss = rss_mb()
+    started = time.perf_counter()
+    backend = create_backend(backend_name)
+    backend.encode(["warm up"])
+    load_seconds = time.perf_counter() - started
+
+    latencies = []
+    for _ in range(repeats):
+        for query in queries:
+            started = time.perf_counter()
+            backend.encode([query])
+            latencies.append((time.perf_counter() - started) * 1000)
+    latencies.sort()
+
+    started = time.perf_counter()
+    backend.encode(queries * 4)
+    batch_per_sec = len(queries) * 4 / (time.perf_counter() - started)
+
+    np.savez(output_path, queries=backend.encode(queries), documents=backend.encode(documents))
+    print(json.dumps({
+        "backend": backend_name,
+        "load_s": load_seconds,
+        "p50_ms": latencies[len(latencies) // 2],
+        "p95_ms": latencies[int(len(latencies) * 0.95)],
+        "batch_per_s": batch_per_sec,
+        "rss_mb": rss_mb(),
+        "model_rss_mb": rss_mb() - baseline_rss,
+    }))
+
+
+def top_k(query_vectors, document_vectors, k):
+    scores = query_vectors @ document_vectors.T
+    return [set(row) for row in np.argsort(-scores, axis=1)[:, :k]]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--backends", nargs="+", default=[REFERENCE, "onnx"])
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--output", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, args.output, args.repeats)
+        return
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for name in args.backends:
+            output = os.path.join(tmp, f"{name}.npz")
+            completed = subprocess.run(
+                [sys.executable, __file__, "--child", name, "--output", output, "--repeats", str(args.repeats)],
+                capture_output=True, text=True, cwd=BACKEND_ROOT,
+            )
+            if completed.returncode != 0:
+                print(f"{name}: failed\n{completed.stderr.strip().splitlines()[-1]}")
+                continue
+            metrics = json.loads(completed.stdout.strip().splitlines()[-1])
+            vectors = np.load(output)
+            results[name] = (metrics, vectors["queries"], vectors["documents"])
+
+    print(f"{'backend':<22} {'load s':>7} {'p50 ms':>7} {'p95 ms':>7} {'batch/s':>8} {'RSS MB':>7} "
+          f"{'top-' + str(args.k):>7} {'cosine':>7}")
+    reference = results.get(REFERENCE)
+    for name, (metrics, queries, documents) in results.items():
+        overlap = cosine = float("nan")
+        if reference is not None:
+            _, ref_queries, ref_documents = reference
+            ours = top_k(queries, documents, args.k)
+            theirs = top_k(ref_queries, ref_documents, args.k)
+            overlap = np.mean([len(a & b) / args.k for a, b in zip(ours, theirs)])
+            cosine = float(np.mean(np.sum(queries * ref_queries, axis=1)))
+        print(f"{name:<22} {metrics['load_s']:>7.2f} {metrics['p50_ms']:>7.2f} {metrics['p95_ms']:>7.2f} "
+              f"{metrics['batch_per_s']:>8.1f} {metrics['rss_mb']:>7.0f} {overlap:>7.2f} {cosine:>7.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""Compare embeddings/sec of per-call encoding against the batching EmbeddingService.
+
+Simulates N concurrent /chat callers inside one event loop, each embedding a
+stream of distinct queries (so the LRU cache never hits and only batching is
+measured):
+  per-call: every caller runs model.encode(query) on the embedding pool,
+            which is what search_qdrant did before the service existed
+  batched:  every caller awaits EmbeddingService.embed(query)
+
+Usage:
+    python benchmarks/embedding_throughput.py [--duration 10] [--levels 1 8 32 128]
+"""
+import argparse
+import asyncio
+import itertools
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from sentence_transformers import SentenceTransformer  # noqa: E402
+
+from app.embedding_service import EMBED_BATCH_WINDOW_MS, EMBED_MAX_BATCH, EmbeddingService  # noqa: E402
+
+TEMPLATES = [
+    "show me users page {}",
+    "create user with name Person{} and phone 555{}",
+    "go to roles {}",
+    "add role called Team{} with permissions read",
+]
+
+
+def query_stream():
+    for i in itertools.count():
+        yield TEMPLATES[i % len(TEMPLATES)].format(i, i)
+
+
+async def run_callers(embed, concurrency, duration):
+    queries = query_stream()
+    done = 0
+    stop_at = time.perf_counter() + duration
+
+    async def caller():
+        nonlocal done
+        while time.perf_counter() < stop_at:
+            await embed(next(queries))
+            done += 1
+
+    await asyncio.gather(*(caller() for _ in range(concurrency)))
+    return done / duration
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per measurement")
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 8, 32, 128])
+    parser.add_argument("--workers", type=int, default=int(os.getenv("EMBED_MAX_WORKERS", "2")))
+    parser.add_argument("--window-ms", type=float, default=EMBED_BATCH_WINDOW_MS)
+    parser.add_argument("--max-batch", type=int, default=EMBED_MAX_BATCH)
+    args = parser.parse_args()
+
+    model = SentenceTransformer("all-MiniLM-L6-v2")
+    executor = ThreadPoolExecutor(max_workers=args.workers)
+    loop = asyncio.get_running_loop()
+
+    async def per_call(query):
+        return (await loop.run_in_executor(executor, model.encode, query)).tolist()
+
+    service = EmbeddingService(
+        lambda texts: model.encode(texts, batch_size=len(texts)),
+        executor,
+        window_ms=args.window_ms,
+        max_batch=args.max_batch,
+        cache_size=0,
+    )
+
+    # Warm up both paths so model/thread start-up is not measured
+    await run_callers(per_call, 1, 1.0)
+    await run_callers(service.embed, 1, 1.0)
+
+    print(f"{'callers':>8} {'per-call/s':>12} {'batched/s':>12} {'speedup':>8}")
+    for concurrency in args.levels:
+        baseline = await run_callers(per_call, concurrency, args.duration)
+        batched = await run_callers(service.embed, concurrency, args.duration)
+        print(f"{concurrency:>8} {baseline:>12.1f} {batched:>12.1f} {batched / baseline:>7.2f}x")
+
+    stats = service.stats()
+    print(f"batched path: {stats['batches']} batches, mean size {stats['mean_batch_size']:.1f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
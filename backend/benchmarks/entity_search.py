@@ -0,0 +1,128 @@
+"""Latency of fuzzy user/role lookups (search_entities) on a large users table.
+
+Needs Postgres (DATABASE_URL / ASYNC_DATABASE_URL, as for the backend).
+Use a scratch database: with --users N, synthetic users are inserted until
+the table holds N rows (one INSERT ... SELECT generate_series). The
+trigram/full-text indexes are then created, the table ANALYZEd, and
+lookups are timed per kind:
+  exact   a stored name, lowercased
+  typo    a stored name with two letters swapped (trigram similarity)
+  partial the last name alone
+  phone   a stored phone number, and its last 5 digits
+The target is p95 under 10 ms at one million users (--target-ms): each
+kind is reported with its p95 against it, and the plan of one fuzzy
+lookup is printed so the trigram GiST index scan (nearest first, no sort
+of all candidates) can be checked.
+
+Usage:
+    python benchmarks/entity_search.py [--users 1000000] [--samples 200]
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+
+from sqlalchemy import text
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.database import AsyncSessionLocal, async_engine, create_tables, engine  # noqa: E402
+from app.entity_search import install_entity_search, search_entities  # noqa: E402
+
+FIRST_NAMES = ["john", "mary", "ahmed", "li", "olga", "pedro", "fatima", "yuki", "noah", "emma", "ivan", "sara"]
+LAST_NAMES = ["smith", "garcia", "chen", "novak", "okafor", "tanaka", "muller", "rossi", "khan", "silva"]
+
+# Names look like "Olga Tanaka 12345" so the table has a realistic spread of trigrams
+SEED_SQL = """
+INSERT INTO users (name, phone_number, email)
+SELECT initcap(f.name) || ' ' || initcap(l.name) || ' ' || n,
+       '+1' || lpad((n * 7919 % 1000000000)::text, 10, '0'),
+       'user' || n || '@example.com'
+FROM generate_series(:start, :stop) AS n
+CROSS JOIN LATERAL (SELECT (ARRAY[{first}])[1 + n % {first_count}] AS name) f
+CROSS JOIN LATERAL (SELECT (ARRAY[{last}])[1 + (n / {first_count}) % {last_count}] AS name) l
+"""
+
+
+def seed_sql():
+    quote = lambda names: ", ".join(f"'{name}'" for name in names)  # noqa: E731
+    return SEED_SQL.format(first=quote(FIRST_NAMES), first_count=len(FIRST_NAMES),
+                           last=quote(LAST_NAMES), last_count=len(LAST_NAMES))
+
+
+def swap_letters(name):
+    if len(name) < 4:
+        return name
+    i = random.randrange(1, len(name) - 2)
+    return name[:i] + name[i + 1] + name[i] + name[i + 2:]
+
+
+# The fuzzy name step of search_names, for EXPLAIN
+FUZZY_SQL = "SELECT id FROM users WHERE lower(name) % :q ORDER BY lower(name) <-> :q LIMIT :n"
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=1_000_000, help="grow the users table to this many rows")
+    parser.add_argument("--samples", type=int, default=200, help="lookups per kind")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--target-ms", type=float, default=10.0, help="p95 target per lookup kind")
+    args = parser.parse_args()
+    random.seed(args.seed)
+
+    create_tables()
+    with engine.begin() as connection:
+        existing = connection.execute(text("SELECT count(*) FROM users")).scalar()
+        if existing < args.users:
+            print(f"inserting {args.users - existing} users...")
+            connection.execute(text(seed_sql()), {"start": existing + 1, "stop": args.users})
+    started = time.perf_counter()
+    install_entity_search(engine)
+    print(f"indexes ready in {time.perf_counter() - started:.1f}s")
+    with engine.begin() as connection:
+        connection.execute(text("ANALYZE users"))
+        sample = connection.execute(
+            text("SELECT name, phone_number FROM users TABLESAMPLE SYSTEM (1) LIMIT :n"), {"n": args.samples}
+        ).all()
+
+    lookups = {
+        "exact": [name.lower() for name, _ in sample],
+        "typo": [swap_letters(name.lower()) for name, _ in sample],
+        "partial": [name.split()[1].lower() for name, _ in sample if len(name.split()) > 1],
+        "phone": [phone for _, phone in sample],
+        "phone_suffix": [phone[-5:] for _, phone in sample],
+    }
+
+    with engine.connect() as connection:
+        plan = connection.execute(
+            text(f"EXPLAIN (ANALYZE, BUFFERS) {FUZZY_SQL}"), {"q": lookups["typo"][0], "n": 5}
+        ).scalars().all()
+    print("fuzzy lookup plan:\n  " + "\n  ".join(plan))
+
+    print(f"{'kind':>13} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'hit rate':>9} {'target':>8}")
+    async with AsyncSessionLocal() as db:
+        await search_entities(db, "warm up", ("users",))
+        for kind, queries in lookups.items():
+            timings, hits = [], 0
+            for query in queries:
+                started = time.perf_counter()
+                found = await search_entities(db, query, ("users",))
+                timings.append((time.perf_counter() - started) * 1000)
+                hits += bool(found)
+            p95 = percentile(timings, 95)
+            print(f"{kind:>13} {statistics.median(timings):>8.2f} {p95:>8.2f} "
+                  f"{percentile(timings, 99):>8.2f} {hits / len(queries):>9.1%} "
+                  f"{'ok' if p95 <= args.target_ms else 'over':>8}")
+    await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,352 @@
+"""Offline accuracy and latency evaluation of the /chat pipeline against a stored baseline.
+
+Replays a labeled corpus (expected action_type, target_page and create
+entities per query) through the same stages as POST /chat without the
+response cache: match_data_query (the query is recognized, not run, so no
+database is needed), route_fast_path, then embed_query, search_qdrant and
+query_ollama. It reports:
+  - intent accuracy (action_type) and target-page accuracy
+  - micro-averaged F1 of the extracted create entities (api_call.data)
+  - p50/p95/p99 latency per stage and end to end
+
+By default no external service is needed:
+  Qdrant  an in-process qdrant-client ":memory:" instance indexed with the
+          seeded pages
+  Ollama  a local HTTP server speaking the /api/chat NDJSON stream, which
+          answers with the keyword fallback action at --fake-token-ms per
+          token (it measures the pipeline, not a model)
+Use --ollama-url / --qdrant-url to evaluate against real services (the
+Qdrant instance must already hold the backend's page collection), and
+--hashing-embedder where the embedding model is not installed.
+
+The run is compared against --baseline. Any quality metric below the
+baseline by more than --quality-tolerance, or a stage p95 above it by more
+than --latency-tolerance, is printed as a REGRESSION and the script exits
+with status 1. --write-baseline stores the current run instead; latency
+baselines are only meaningful on the machine that wrote them.
+
+Usage:
+    python benchmarks/eval_chat.py [--hashing-embedder] [--write-baseline]
+    python benchmarks/eval_chat.py --ollama-url http://localhost:11434 --baseline my_baseline.json
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import re
+import sys
+import threading
+import time
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+
+import numpy as np
+
+BACKEND_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, BACKEND_ROOT)
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+DEFAULT_CORPUS = os.path.join(DATA_DIR, "eval_corpus.jsonl")
+DEFAULT_BASELINE = os.path.join(DATA_DIR, "eval_baseline.json")
+
+QUALITY_METRICS = ("intent_accuracy", "target_accuracy", "entity_f1")
+STAGES = ("data_query", "fast_path", "embed", "retrieve", "generate", "total")
+LATENCY_SLACK_MS = 5.0
+
+
+def percentile(samples, pct):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class FakeOllamaHandler(BaseHTTPRequestHandler):
+    """Streams the keyword-fallback action for the query in the last user message"""
+
+    token_delay = 0.005
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        prompt = body["messages"][-1]["content"]
+        query = prompt.rpartition("User query: ")[2]
+
+        from app.llm_handler import get_fallback_response, validate_action
+        text = json.dumps(validate_action(get_fallback_response(query)))
+        tokens = [text[start:start + 4] for start in range(0, len(text), 4)]
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.end_headers()
+        started = time.perf_counter()
+        try:
+            for token in tokens:
+                time.sleep(self.token_delay)
+                self._write_line({"message": {"role": "assistant", "content": token}, "done": False})
+            self._write_line({
+                "message": {"role": "assistant", "content": ""},
+                "done": True,
+                "prompt_eval_count": len(prompt) // 4,
+                "eval_count": len(tokens),
+                "eval_duration": int((time.perf_counter() - started) * 1e9),
+            })
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # the client stops reading once the action object is complete
+
+    def _write_line(self, data):
+        self.wfile.write((json.dumps(data) + "\n").encode("utf-8"))
+        self.wfile.flush()
+
+    def log_message(self, *args):
+        pass
+
+
+def start_fake_ollama(token_ms):
+    FakeOllamaHandler.token_delay = token_ms / 1000
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeOllamaHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def hashing_embedder_class():
+    from app.embedding_backends import EMBEDDING_DIMENSION, EmbeddingBackend
+
+    class HashingEmbedder(EmbeddingBackend):
+        """Bag-of-words feature hashing: a model-free stand-in for machines without torch"""
+
+        name = "hashing"
+
+        def encode(self, texts):
+            vectors = np.zeros((len(texts), EMBEDDING_DIMENSION), dtype=np.float32)
+            for row, text in enumerate(texts):
+                for word in re.findall(r"\w+", text.lower()):
+                    bucket = int(hashlib.md5(word.encode("utf-8")).hexdigest(), 16) % EMBEDDING_DIMENSION
+                    vectors[row, bucket] += 1.0
+            norms = np.clip(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12, None)
+            return vectors / norms
+
+    return HashingEmbedder
+
+
+async def index_in_memory_qdrant():
+    """Create an in-process Qdrant with the seeded pages and make search_qdrant use it"""
+    from qdrant_client import AsyncQdrantClient
+    from qdrant_client.http.models import Distance, PointStruct, VectorParams
+
+    from app import qdrant_handler
+    from app.embedding_backends import EMBEDDING_DIMENSION
+    from app.seed_data import DEFAULT_PAGES
+
+    client = AsyncQdrantClient(":memory:")
+    await client.create_collection(
+        collection_name=qdrant_handler.COLLECTION_NAME,
+        vectors_config=VectorParams(size=EMBEDDING_DIMENSION, distance=Distance.COSINE),
+    )
+    payloads = [qdrant_handler.page_payload(SimpleNamespace(id=i, **page)) for i, page in enumerate(DEFAULT_PAGES, 1)]
+    vectors = qdrant_handler.encode_batch([qdrant_handler.page_text(payload) for payload in payloads])
+    await client.upsert(
+        collection_name=qdrant_handler.COLLECTION_NAME,
+        points=[PointStruct(id=payload["id"], vector=list(map(float, vector)), payload=payload)
+                for payload, vector in zip(payloads, vectors)],
+    )
+    qdrant_handler._async_client = client
+
+
+def entity_pairs(entities):
+    pairs = set()
+    for key, value in (entities or {}).items():
+        for item in value if isinstance(value, list) else [value]:
+            pairs.add((key, str(item).strip().lower()))
+    return pairs
+
+
+async def run_query(query):
+    """One /chat pass (minus the response cache), returning (response, {stage: ms})"""
+    from app.data_queries import match_data_query, query_action
+    from app.intent_router import route_fast_path
+    from app.llm_handler import query_ollama
+    from app.qdrant_handler import embed_query, search_qdrant
+
+    timings = {}
+    started = time.perf_counter()
+    response = None
+    matched = match_data_query(query)
+    timings["data_query"] = (time.perf_counter() - started) * 1000
+    if matched is not None:
+        response = query_action(*matched, "")
+    else:
+        stage_started = time.perf_counter()
+        response = route_fast_path(query)
+        timings["fast_path"] = (time.perf_counter() - stage_started) * 1000
+    if response is None:
+        stage_started = time.perf_counter()
+        embedding = await embed_query(query)
+        timings["embed"] = (time.perf_counter() - stage_started) * 1000
+
+        stage_started = time.perf_counter()
+        context = await search_qdrant(query, query_embedding=embedding)
+        timings["retrieve"] = (time.perf_counter() - stage_started) * 1000
+
+        stage_started = time.perf_counter()
+        response = await query_ollama(context, query)
+        timings["generate"] = (time.perf_counter() - stage_started) * 1000
+    timings["total"] = (time.perf_counter() - started) * 1000
+    return response, timings
+
+
+async def evaluate(corpus, verbose):
+    stage_samples = defaultdict(list)
+    intent_hits = target_hits = target_total = 0
+    true_positives = false_positives = false_negatives = 0
+
+    for case in corpus:
+        response, timings = await run_query(case["query"])
+        for stage, ms in timings.items():
+            stage_samples[stage].append(ms)
+
+        intent_ok = response.get("action_type") == case["action_type"]
+        intent_hits += intent_ok
+        if case.get("target_page"):
+            target_total += 1
+            target_hits += response.get("target_page") == case["target_page"]
+
+        predicted = entity_pairs((response.get("api_call") or {}).get("data")
+                                 if response.get("action_type") == "create" else {})
+        expected = entity_pairs(case.get("entities"))
+        true_positives += len(predicted & expected)
+        false_positives += len(predicted - expected)
+        false_negatives += len(expected - predicted)
+
+        if verbose and (not intent_ok or predicted != expected):
+            print(f"  MISS {case['query']!r}: got {response.get('action_type')}/{response.get('target_page')} "
+                  f"{sorted(predicted)}, expected {case['action_type']}/{case.get('target_page')} {sorted(expected)}")
+
+    precision = true_positives / max(true_positives + false_positives, 1)
+    recall = true_positives / max(true_positives + false_negatives, 1)
+    return {
+        "queries": len(corpus),
+        "intent_accuracy": round(intent_hits / len(corpus), 4),
+        "target_accuracy": round(target_hits / max(target_total, 1), 4),
+        "entity_f1": round(2 * precision * recall / max(precision + recall, 1e-9), 4),
+        "latency_ms": {
+            stage: {f"p{pct}": round(percentile(stage_samples[stage], pct), 3) for pct in (50, 95, 99)}
+            for stage in STAGES if stage_samples[stage]
+        },
+    }
+
+
+def compare(current, baseline, quality_tolerance, latency_tolerance):
+    """Return a list of regression descriptions (empty when the run is at least as good)"""
+    regressions = []
+    for metric in QUALITY_METRICS:
+        if metric in baseline and current[metric] < baseline[metric] - quality_tolerance:
+            regressions.append(f"{metric} {current[metric]:.4f} < baseline {baseline[metric]:.4f}")
+    for stage, percentiles in baseline.get("latency_ms", {}).items():
+        if stage not in current["latency_ms"]:
+            continue
+        now, before = current["latency_ms"][stage]["p95"], percentiles["p95"]
+        # Absolute slack keeps millisecond-scale stages from flapping on scheduler noise
+        if now > before * (1 + latency_tolerance) + LATENCY_SLACK_MS:
+            regressions.append(f"{stage} p95 {now:.1f} ms > baseline {before:.1f} ms")
+    return regressions
+
+
+def print_report(result, baseline):
+    def fmt(value):
+        return "-" if value is None else f"{value:.4f}"
+
+    print(f"{'metric':>16} {'current':>10} {'baseline':>10}")
+    for metric in QUALITY_METRICS:
+        print(f"{metric:>16} {fmt(result[metric]):>10} {fmt((baseline or {}).get(metric)):>10}")
+    print()
+    print(f"{'stage (ms)':>16} {'p50':>9} {'p95':>9} {'p99':>9} {'base p95':>9}")
+    for stage, values in result["latency_ms"].items():
+        base = ((baseline or {}).get("latency_ms", {}).get(stage) or {}).get("p95")
+        print(f"{stage:>16} {values['p50']:>9.2f} {values['p95']:>9.2f} {values['p99']:>9.2f} "
+              f"{'-' if base is None else f'{base:.2f}':>9}")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS, help="JSONL with query, action_type, target_page, entities")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--write-baseline", action="store_true", help="store this run as the baseline")
+    parser.add_argument("--ollama-url", help="real Ollama instead of the local stand-in")
+    parser.add_argument("--qdrant-url", help="real Qdrant (already indexed) instead of the in-memory stand-in")
+    parser.add_argument("--hashing-embedder", action="store_true", help="model-free embeddings for retrieval")
+    parser.add_argument("--repeat", type=int, default=3, help="passes over the corpus (more latency samples)")
+    parser.add_argument("--fake-token-ms", type=float, default=5.0, help="stand-in Ollama delay per token")
+    parser.add_argument("--quality-tolerance", type=float, default=0.01)
+    parser.add_argument("--latency-tolerance", type=float, default=0.5, help="allowed relative p95 increase")
+    parser.add_argument("--verbose", action="store_true", help="print every mispredicted query")
+    args = parser.parse_args()
+
+    # llm_handler reads OLLAMA_BASE_URL at import time, so set it before importing the app
+    fake_server = None
+    if args.ollama_url:
+        os.environ["OLLAMA_BASE_URL"] = args.ollama_url
+    else:
+        fake_server, os.environ["OLLAMA_BASE_URL"] = start_fake_ollama(args.fake_token_ms)
+
+    from app import qdrant_handler
+    from app.page_catalog import page_catalog
+    from app.seed_data import DEFAULT_PAGES
+
+    if args.hashing_embedder:
+        qdrant_handler._backend = hashing_embedder_class()()
+    if args.qdrant_url:
+        from qdrant_client import AsyncQdrantClient
+        qdrant_handler._async_client = AsyncQdrantClient(url=args.qdrant_url)
+    else:
+        await index_in_memory_qdrant()
+    page_catalog.load(DEFAULT_PAGES)
+
+    with open(args.corpus) as f:
+        corpus = [json.loads(line) for line in f if line.strip()]
+
+    # One untimed pass loads the model and opens connections
+    await run_query(corpus[0]["query"])
+    result = await evaluate(corpus * args.repeat, args.verbose)
+    result["queries"] = len(corpus)
+    result["config"] = {
+        "ollama": args.ollama_url or f"stand-in ({args.fake_token_ms:g} ms/token)",
+        "qdrant": args.qdrant_url or "stand-in (:memory:)",
+        "embedder": "hashing" if args.hashing_embedder else qdrant_handler.EMBEDDING_BACKEND,
+    }
+
+    baseline = None
+    if os.path.exists(args.baseline) and not args.write_baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    print_report(result, baseline)
+
+    if fake_server is not None:
+        fake_server.shutdown()
+    if args.write_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(result, f, indent=2)
+            f.write("\n")
+        print(f"\nbaseline written to {args.baseline}")
+        return 0
+    if baseline is None:
+        print(f"\nno baseline at {args.baseline}; run with --write-baseline to create one")
+        return 0
+
+    if baseline.get("config") != result["config"]:
+        print(f"\nwarning: baseline was recorded with {baseline.get('config')}, this run uses {result['config']}")
+    regressions = compare(result, baseline, args.quality_tolerance, args.latency_tolerance)
+    if regressions:
+        print("\n" + "=" * 60)
+        for regression in regressions:
+            print(f"REGRESSION: {regression}")
+        print("=" * 60)
+        return 1
+    print("\nno regressions against the baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
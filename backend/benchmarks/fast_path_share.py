@@ -0,0 +1,61 @@
+"""Report how much of a replayed query log the fast-path intent router serves.
+
+Builds the router from the seeded page set (no Postgres, Qdrant or Ollama
+needed), replays the log and prints the share of queries answered without
+the RAG path, a per-action breakdown and the routing cost per query.
+
+Usage:
+    python benchmarks/fast_path_share.py [--log benchmarks/data/query_log.txt]
+"""
+import argparse
+import os
+import sys
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.intent_router import FAST_PATH_MIN_CONFIDENCE, IntentRouter  # noqa: E402
+from app.seed_data import DEFAULT_PAGES  # noqa: E402
+
+DEFAULT_LOG = os.path.join(os.path.dirname(__file__), "data", "query_log.txt")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--log", default=DEFAULT_LOG, help="one query per line")
+    parser.add_argument("--threshold", type=float, default=FAST_PATH_MIN_CONFIDENCE)
+    parser.add_argument("--repeat", type=int, default=1000, help="timing repetitions per query")
+    parser.add_argument("--verbose", action="store_true", help="print the decision for every query")
+    args = parser.parse_args()
+
+    with open(args.log) as f:
+        queries = [line.strip() for line in f if line.strip()]
+
+    router = IntentRouter(DEFAULT_PAGES)
+    served = Counter()
+    timings_us = []
+    for query in queries:
+        started = time.perf_counter()
+        for _ in range(args.repeat):
+            action, confidence = router.route(query)
+        timings_us.append((time.perf_counter() - started) / args.repeat * 1e6)
+
+        fast = action is not None and confidence >= args.threshold
+        served[action["action_type"] if fast else "rag"] += 1
+        if args.verbose:
+            label = action["action_type"] if fast else "-> rag"
+            print(f"{confidence:4.2f} {label:<9} {query}")
+
+    total = len(queries)
+    fast_total = total - served["rag"]
+    timings_us.sort()
+    print(f"queries:        {total}")
+    print(f"fast path:      {fast_total} ({fast_total / total:.1%}) at threshold {args.threshold}")
+    for action_type, count in sorted(served.items()):
+        print(f"  {action_type:<12} {count}")
+    print(f"routing cost:   mean {sum(timings_us) / total:.1f}us, max {timings_us[-1]:.1f}us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Measure repeated list-page loads with and without If-None-Match revalidation.
+
+Runs against a live backend. Each worker repeatedly GETs the same list pages
+(the first pages of /api/users, /api/roles and /api/pages):
+  plain:       no validator, so every request returns the full body (served
+               from the encoded-body cache after the first miss)
+  conditional: sends the last ETag seen for the URL, so unchanged pages come
+               back as 304 Not Modified with no body and no database query
+Reports requests/s, the share of 304s, and response body bytes per request.
+
+Usage:
+    python benchmarks/list_etag.py [--url http://localhost:8050] [--requests 2000] [--concurrency 16]
+"""
+import argparse
+import asyncio
+import itertools
+import os
+import time
+
+import httpx
+
+PATHS = [
+    "/api/users?limit=100",
+    "/api/roles?limit=100",
+    "/api/pages?limit=100",
+]
+
+
+async def run(client, total, concurrency, conditional):
+    etags = {}
+    counter = itertools.count()
+    stats = {"requests": 0, "not_modified": 0, "bytes": 0}
+
+    async def worker():
+        while next(counter) < total:
+            path = PATHS[stats["requests"] % len(PATHS)]
+            headers = {"If-None-Match": etags[path]} if conditional and path in etags else {}
+            response = await client.get(path, headers=headers)
+            if response.status_code not in (200, 304):
+                response.raise_for_status()
+            if "etag" in response.headers:
+                etags[path] = response.headers["etag"]
+            stats["requests"] += 1
+            stats["bytes"] += len(response.content)
+            stats["not_modified"] += response.status_code == 304
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    stats["seconds"] = time.perf_counter() - started
+    return stats
+
+
+def report(label, stats):
+    requests = stats["requests"]
+    print(f"{label:>12} {requests / stats['seconds']:>10.0f} {stats['not_modified'] / requests:>8.1%} "
+          f"{stats['bytes'] / requests:>12.0f} {stats['bytes'] / 1024:>12.0f}")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default=os.getenv("BACKEND_URL", "http://localhost:8050"))
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args()
+
+    limits = httpx.Limits(max_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.url, timeout=30, limits=limits) as client:
+        # Warm the encoded-body cache so both runs start from the same state
+        for path in PATHS:
+            (await client.get(path)).raise_for_status()
+        plain = await run(client, args.requests, args.concurrency, conditional=False)
+        conditional = await run(client, args.requests, args.concurrency, conditional=True)
+
+        stats = (await client.get("/api/cache/stats")).json()
+
+    print(f"{'mode':>12} {'req/s':>10} {'304s':>8} {'bytes/req':>12} {'total KiB':>12}")
+    report("plain", plain)
+    report("conditional", conditional)
+    print(f"server list cache: {stats}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
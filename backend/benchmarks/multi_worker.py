@@ -0,0 +1,166 @@
+"""Total memory and /chat throughput of the gunicorn multi-worker mode at several worker counts.
+
+For every worker count (and, with --modes, with and without preload_app)
+the script starts `gunicorn -c gunicorn.conf.py app.main:app` from the
+backend directory with the current environment (DATABASE_URL, QDRANT_HOST,
+OLLAMA_BASE_URL, ...), waits until /ready answers, then:
+  - sums RSS and PSS over the master and its workers (/proc, Linux only).
+    RSS counts shared pages once per process; PSS splits them between the
+    processes sharing them, so it is the real total.
+  - replays the query log against /chat at --concurrency for --duration
+    seconds and reports requests/s and latency percentiles
+Stop the backend container first (or pass --port) so the ports do not clash.
+
+Usage:
+    python benchmarks/multi_worker.py [--workers 1 4 8] [--modes preload no-preload] [--duration 20]
+"""
+import argparse
+import asyncio
+import os
+import signal
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+BACKEND_DIR = os.path.join(os.path.dirname(__file__), "..")
+DATA_DIR = os.path.join(os.path.dirname(__file__), "data")
+
+
+def read_queries():
+    with open(os.path.join(DATA_DIR, "query_log.txt")) as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def children(pid):
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            return [int(child) for child in f.read().split()]
+    except OSError:
+        return []
+
+
+def memory_kib(pid):
+    """(RSS, PSS) of one process in KiB"""
+    rss = pss = 0
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                if line.startswith("Rss:"):
+                    rss = int(line.split()[1])
+                elif line.startswith("Pss:"):
+                    pss = int(line.split()[1])
+    except OSError:
+        pass
+    return rss, pss
+
+
+def total_memory_mib(master_pid):
+    pids = [master_pid] + children(master_pid)
+    usage = [memory_kib(pid) for pid in pids]
+    return len(pids) - 1, sum(rss for rss, _ in usage) / 1024, sum(pss for _, pss in usage) / 1024
+
+
+async def wait_ready(base_url, workers, timeout):
+    """Poll /ready until enough consecutive answers are 200 that every worker has likely warmed up"""
+    deadline = time.monotonic() + timeout
+    streak = 0
+    async with httpx.AsyncClient(base_url=base_url, timeout=5) as client:
+        while time.monotonic() < deadline:
+            try:
+                ok = (await client.get("/ready")).status_code == 200
+            except httpx.HTTPError:
+                ok = False
+            streak = streak + 1 if ok else 0
+            if streak >= workers * 4:
+                return True
+            await asyncio.sleep(0.25)
+    return False
+
+
+async def load(base_url, queries, concurrency, duration):
+    latencies, errors = [], 0
+    stop_at = time.monotonic() + duration
+
+    async def caller(client, offset):
+        nonlocal errors
+        index = offset
+        while time.monotonic() < stop_at:
+            started = time.perf_counter()
+            try:
+                response = await client.post("/chat", json={"query": queries[index % len(queries)]})
+                response.raise_for_status()
+                latencies.append((time.perf_counter() - started) * 1000)
+            except httpx.HTTPError:
+                errors += 1
+            index += concurrency
+
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=60, limits=limits) as client:
+        started = time.monotonic()
+        await asyncio.gather(*(caller(client, offset) for offset in range(concurrency)))
+        elapsed = time.monotonic() - started
+    return latencies, errors, elapsed
+
+
+def percentile(values, pct):
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+async def run(workers, mode, args, queries):
+    env = dict(os.environ, WEB_CONCURRENCY=str(workers), PORT=str(args.port),
+               GUNICORN_PRELOAD="1" if mode == "preload" else "0")
+    process = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", args.config, "app.main:app"],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    base_url = f"http://127.0.0.1:{args.port}"
+    try:
+        started = time.monotonic()
+        if not await wait_ready(base_url, workers, args.startup_timeout):
+            print(f"{mode:>10} {workers:>7}  did not become ready within {args.startup_timeout}s")
+            return
+        startup = time.monotonic() - started
+        # Memory once every worker has warmed up, before the load adds caches and buffers
+        deadline = time.monotonic() + 10
+        while len(children(process.pid)) < workers and time.monotonic() < deadline:
+            await asyncio.sleep(0.25)
+        counted, rss, pss = total_memory_mib(process.pid)
+        latencies, errors, elapsed = await load(base_url, queries, args.concurrency, args.duration)
+        print(f"{mode:>10} {counted:>7} {startup:>9.1f} {rss:>10.0f} {pss:>10.0f} "
+              f"{len(latencies) / elapsed:>8.1f} {statistics.median(latencies) if latencies else float('nan'):>8.1f} "
+              f"{percentile(latencies, 95):>8.1f} {errors:>7}")
+    finally:
+        process.send_signal(signal.SIGTERM)
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--modes", nargs="+", choices=["preload", "no-preload"], default=["preload"])
+    parser.add_argument("--port", type=int, default=8051)
+    parser.add_argument("--config", default="gunicorn.conf.py", help="gunicorn config, relative to backend/")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds of /chat load per run")
+    parser.add_argument("--startup-timeout", type=float, default=300.0)
+    args = parser.parse_args()
+
+    queries = read_queries()
+    print(f"{'mode':>10} {'workers':>7} {'ready (s)':>9} {'RSS MiB':>10} {'PSS MiB':>10} "
+          f"{'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'errors':>7}")
+    for mode in args.modes:
+        for workers in args.workers:
+            await run(workers, mode, args, queries)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
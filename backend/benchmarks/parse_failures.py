@@ -0,0 +1,78 @@
+"""Measure the action parse-failure rate with and without Ollama's `format` JSON schema.
+
+Replays a fixed query corpus against a running Ollama server, once with the
+schema-constrained payload the backend sends and once with `format` removed
+(free text, as before), and counts outputs that are not a single valid
+ChatResponse object. Also reports generated tokens per answer, since
+constrained output ends as soon as the object closes.
+
+Usage:
+    python benchmarks/parse_failures.py [--url http://localhost:11434] [--corpus benchmarks/data/query_log.txt]
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+
+import httpx
+from pydantic import ValidationError
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.llm_handler import chat_payload, validate_action  # noqa: E402
+from app.page_catalog import page_catalog  # noqa: E402
+from app.qdrant_handler import get_fallback_context  # noqa: E402
+from app.seed_data import DEFAULT_PAGES  # noqa: E402
+from app.stream_parser import IncrementalActionParser  # noqa: E402
+
+DEFAULT_CORPUS = os.path.join(os.path.dirname(__file__), "data", "query_log.txt")
+
+
+def parses(text):
+    parser = IncrementalActionParser()
+    parser.feed(text)
+    try:
+        validate_action(parser.result())
+        return True
+    except (json.JSONDecodeError, ValidationError):
+        return False
+
+
+def run(client, queries, constrained):
+    failures, eval_counts = [], []
+    for query in queries:
+        payload = chat_payload(get_fallback_context(), query, stream=False)
+        if not constrained:
+            del payload["format"]
+        data = client.post("/api/chat", json=payload).json()
+        eval_counts.append(data.get("eval_count", 0))
+        if not parses(data["message"]["content"]):
+            failures.append(query)
+    return failures, eval_counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default=os.getenv("OLLAMA_BASE_URL", "http://localhost:11434"))
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS, help="one query per line")
+    parser.add_argument("--verbose", action="store_true", help="list the queries that failed")
+    args = parser.parse_args()
+
+    with open(args.corpus) as f:
+        queries = [line.strip() for line in f if line.strip()]
+    page_catalog.load(DEFAULT_PAGES)
+
+    print(f"{'output':>12} {'failures':>9} {'rate':>7} {'mean tokens':>12}")
+    with httpx.Client(base_url=args.url, timeout=120) as client:
+        for label, constrained in (("free text", False), ("json schema", True)):
+            failures, eval_counts = run(client, queries, constrained)
+            print(f"{label:>12} {len(failures):>9} {len(failures) / len(queries):>7.1%} "
+                  f"{statistics.mean(eval_counts):>12.1f}")
+            if args.verbose:
+                for query in failures:
+                    print(f"    {query}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""Compare Ollama prompt-eval cost of the legacy prompt against the cached-prefix chat prompt.
+
+Replays a query log against a running Ollama server twice, one request at a
+time:
+  before: /api/generate with the old single f-string prompt (rules and
+          examples around the spliced-in context) and 5 context pages
+  after:  /api/chat with the fixed system prefix, keep_alive, and context
+          trimmed to CONTEXT_TOKEN_BUDGET
+Context pages come from the retrieval corpus, ranked by word overlap with
+the query, so Qdrant and the embedding model are not needed. Ollama's own
+prompt_eval_count / prompt_eval_duration are reported, so network and
+generation time do not blur the comparison.
+
+Usage:
+    python benchmarks/prompt_eval.py [--url http://localhost:11434] [--limit 32]
+"""
+import argparse
+import os
+import statistics
+import sys
+
+import httpx
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.llm_handler import OLLAMA_MODEL, chat_payload  # noqa: E402
+from app.qdrant_handler import CONTEXT_TOKEN_BUDGET, QDRANT_SEARCH_LIMIT, fit_to_budget  # noqa: E402
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), "data")
+
+LEGACY_PROMPT = """You are a smart dashboard assistant. Based on the user query and available context, determine the appropriate action.
+
+Available pages:
+{context}
+
+User query: {query}
+
+STRICT RULES:
+1. For navigation: use action_type "navigate" with route like "/users" or "/roles" (NO /api/)
+2. For creating: use action_type "create" with api_call object containing method, endpoint, and data
+3. ALWAYS include api_call for create actions
+4. Extract exact names and phone numbers from user input
+5. To create several records at once, use ONE api_call to the ":bulk" endpoint with data {{"items": [...]}}
+
+Examples:
+- "show me users" -> {{"action_type": "navigate", "target_page": "users", "route": "/users", "message": "Navigating to users page"}}
+- "create user with name John and phone 123456" -> {{"action_type": "create", "target_page": "users", "route": "/users", "api_call": {{"method": "POST", "endpoint": "/api/users", "data": {{"name": "John", "phone_number": "123456"}}}}, "message": "Creating new user John"}}
+- "create users John 123456 and Mary 654321" -> {{"action_type": "create", "target_page": "users", "route": "/users", "api_call": {{"method": "POST", "endpoint": "/api/users:bulk", "data": {{"items": [{{"name": "John", "phone_number": "123456"}}, {{"name": "Mary", "phone_number": "654321"}}]}}}}, "message": "Creating 2 new users"}}
+
+Respond ONLY with valid JSON:"""
+
+
+def read_lines(name):
+    with open(os.path.join(DATA_DIR, name)) as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def ranked_context(query, corpus, limit):
+    words = set(query.lower().split())
+    ranked = sorted(corpus, key=lambda doc: -len(words & set(doc.lower().split())))
+    return [f"- {doc}" for doc in ranked[:limit]]
+
+
+def summarize(label, results):
+    counts = [r.get("prompt_eval_count", 0) for r in results]
+    # Ollama reports durations in nanoseconds
+    durations_ms = [r.get("prompt_eval_duration", 0) / 1e6 for r in results]
+    totals_ms = [r.get("total_duration", 0) / 1e6 for r in results]
+    print(f"{label:>7} {statistics.mean(counts):>14.1f} {statistics.median(durations_ms):>16.1f} "
+          f"{statistics.mean(durations_ms):>15.1f} {statistics.median(totals_ms):>13.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default=os.getenv("OLLAMA_BASE_URL", "http://localhost:11434"))
+    parser.add_argument("--limit", type=int, default=32, help="queries to replay")
+    parser.add_argument("--budget", type=int, default=CONTEXT_TOKEN_BUDGET)
+    args = parser.parse_args()
+
+    queries = read_lines("query_log.txt")[:args.limit]
+    corpus = read_lines("retrieval_corpus.txt")
+
+    before, after = [], []
+    with httpx.Client(base_url=args.url, timeout=120) as client:
+        # Load the model once so neither run pays the cold start
+        client.post("/api/generate", json={"model": OLLAMA_MODEL, "prompt": "", "keep_alive": "30m"})
+        for query in queries:
+            context = "\n".join(ranked_context(query, corpus, 5))
+            response = client.post("/api/generate", json={
+                "model": OLLAMA_MODEL,
+                "prompt": LEGACY_PROMPT.format(context=context, query=query),
+                "stream": False,
+            })
+            before.append(response.json())
+        for query in queries:
+            context = "\n".join(fit_to_budget(ranked_context(query, corpus, QDRANT_SEARCH_LIMIT), args.budget))
+            response = client.post("/api/chat", json=chat_payload(context, query, stream=False))
+            after.append(response.json())
+
+    print(f"{'prompt':>7} {'prompt tokens':>14} {'p50 eval (ms)':>16} {'mean eval (ms)':>15} {'p50 total':>13}")
+    summarize("before", before)
+    summarize("after", after)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""Multi-worker mode: gunicorn -c gunicorn.conf.py app.main:app
+
+The master imports the app and runs app.main.preload() before forking:
+startup work (tables, seeding) happens once, and the embedding model
+weights are loaded once and shared copy-on-write by every worker. The
+master never encodes; one worker syncs the Qdrant page index after the
+fork. Each worker is an asyncio uvicorn server with its own
+database pool, LLM queue and caches; the Ollama slots are shared.
+
+/metrics is aggregated over all workers (prometheus_client multiprocess
+mode, files under PROMETHEUS_MULTIPROC_DIR). The JSON stats endpoints
+(/health, /startup-profile, /chat/scheduler/stats, /chat/cache/stats,
+/api/cache/stats) describe only the worker that answered the request.
+"""
+import os
+import shutil
+import tempfile
+
+# Must be set before the app (and prometheus_client) is imported, and start empty
+metrics_dir = os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", os.path.join(tempfile.gettempdir(), "hexa-metrics"))
+shutil.rmtree(metrics_dir, ignore_errors=True)
+os.makedirs(metrics_dir, exist_ok=True)
+
+# Every worker has its own LLM queue; OLLAMA_NUM_PARALLEL is enforced across
+# all of them with Postgres advisory-lock slots (app.llm_scheduler.SharedSlots)
+os.environ.setdefault("LLM_SHARED_SLOTS", "1")
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8050')}"
+workers = int(os.getenv("WEB_CONCURRENCY", "4"))
+worker_class = "uvicorn_worker.UvicornWorker"
+preload_app = os.getenv("GUNICORN_PRELOAD", "1") == "1"
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+graceful_timeout = 30
+keepalive = 5
+
+
+def on_starting(server):
+    # With preload_app the app module is already imported in the master here
+    if preload_app:
+        from app.main import preload
+        preload()
+
+
+def post_fork(server, worker):
+    # A worker inherits the master's NOTIFY sender id and would drop its siblings' messages as its own
+    from app.pg_notify import new_worker_id
+    new_worker_id()
+
+
+def child_exit(server, worker):
+    # Drop the dead worker's live gauges (queue depth, in flight) from the /metrics sum
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
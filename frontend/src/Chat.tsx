@@ -1,12 +1,12 @@
 import React, { useState } from "react";
 import { useNavigate } from "react-router-dom";
-import { api, ChatResponse, sendChatMessage } from "./api";
+import { api, ChatResponse, streamChatMessage } from "./api";
 import './Dashboard.css';
 import Executor from "./Executor";
 
 export default function Chat() {
   const [query, setQuery] = useState("");
-  const [response, setResponse] = useState<ChatResponse | null>(null);
+  const [response, setResponse] = useState<Partial<ChatResponse> | null>(null);
   const [loading, setLoading] = useState(false);
   const [messages, setMessages] = useState<Array<{type: 'user' | 'bot', content: string}>>([]);
   const [isOpen, setIsOpen] = useState(false);
@@ -20,17 +20,17 @@ export default function Chat() {
     setMessages(prev => [...prev, {type: 'user', content: query}]);
 
     try {
-      const chatResponse = await sendChatMessage(query);
+      // Navigation is handled by the Executor as soon as the streamed action has a route
+      const chatResponse = await streamChatMessage(query, (event) => {
+        if (event.type === 'action') {
+          setResponse(event.action);
+        } else if (event.type === 'escalate') {
+          setResponse(null);
+        }
+      });
       setResponse(chatResponse);
       setMessages(prev => [...prev, {type: 'bot', content: chatResponse.message}]);
 
-      // Handle navigation
-      if (chatResponse.action_type === 'navigate' && chatResponse.route) {
-        setTimeout(() => {
-          navigate(chatResponse.route!);
-        }, 1000);
-      }
-
       // Handle API calls
       if (chatResponse.action_type === 'create' && chatResponse.api_call) {
         try {
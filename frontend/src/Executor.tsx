@@ -1,21 +1,16 @@
 import { useEffect } from "react";
 import { useNavigate } from "react-router-dom";
+import { ChatResponse } from "./api";
 
-export default function Executor({ action }) {
+// Navigates as soon as a (possibly partial, streamed) action has its route
+export default function Executor({ action }: { action: Partial<ChatResponse> }) {
   const navigate = useNavigate();
 
   useEffect(() => {
-    if (action.action === "navigate") {
-      navigate(action.targetPage);
-    } else if (action.action === "fill_form") {
-      navigate(action.targetPage);
-      setTimeout(() => {
-        window.dispatchEvent(
-          new CustomEvent("prefill-form", { detail: action.fields })
-        );
-      }, 500);
+    if (action.action_type === "navigate" && action.route) {
+      navigate(action.route);
     }
-  }, [action]);
+  }, [action.action_type, action.route]);
 
   return null;
-}
\ No newline at end of file
+}
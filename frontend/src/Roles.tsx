@@ -12,6 +12,7 @@ interface Role {
 
 const Roles: React.FC = () => {
   const [roles, setRoles] = useState<Role[]>([]);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
   const [loading, setLoading] = useState(true);
   const [showForm, setShowForm] = useState(false);
   const [newRole, setNewRole] = useState({
@@ -26,10 +27,12 @@ const Roles: React.FC = () => {
     fetchRoles();
   }, []);
 
-  const fetchRoles = async () => {
+  // The list is keyset-paginated: X-Next-Cursor is set while more pages remain
+  const fetchRoles = async (cursor?: string) => {
     try {
-      const response = await api.get('/api/roles');
-      setRoles(response.data);
+      const response = await api.get('/api/roles', { params: cursor ? { cursor } : {} });
+      setRoles(prev => cursor ? [...prev, ...response.data] : response.data);
+      setNextCursor(response.headers['x-next-cursor'] ?? null);
     } catch (error) {
       console.error('Error fetching roles:', error);
     } finally {
@@ -116,7 +119,7 @@ const Roles: React.FC = () => {
       )}
 
       <div className="users-list">
-        <h3>All Roles ({roles.length})</h3>
+        <h3>All Roles ({roles.length}{nextCursor ? '+' : ''})</h3>
         {roles.length === 0 ? (
           <p>No roles found. Create your first role!</p>
         ) : (
@@ -144,6 +147,11 @@ const Roles: React.FC = () => {
             ))}
           </div>
         )}
+        {nextCursor && (
+          <button className="btn-primary" onClick={() => fetchRoles(nextCursor)}>
+            Load more
+          </button>
+        )}
       </div>
     </div>
   );
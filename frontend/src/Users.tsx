@@ -12,6 +12,7 @@ interface User {
 
 const Users: React.FC = () => {
   const [users, setUsers] = useState<User[]>([]);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
   const [loading, setLoading] = useState(true);
   const [showForm, setShowForm] = useState(false);
   const [newUser, setNewUser] = useState({
@@ -24,10 +25,12 @@ const Users: React.FC = () => {
     fetchUsers();
   }, []);
 
-  const fetchUsers = async () => {
+  // The list is keyset-paginated: X-Next-Cursor is set while more pages remain
+  const fetchUsers = async (cursor?: string) => {
     try {
-      const response = await api.get('/api/users');
-      setUsers(response.data);
+      const response = await api.get('/api/users', { params: cursor ? { cursor } : {} });
+      setUsers(prev => cursor ? [...prev, ...response.data] : response.data);
+      setNextCursor(response.headers['x-next-cursor'] ?? null);
     } catch (error) {
       console.error('Error fetching users:', error);
     } finally {
@@ -97,7 +100,7 @@ const Users: React.FC = () => {
       )}
 
       <div className="users-list">
-        <h3>All Users ({users.length})</h3>
+        <h3>All Users ({users.length}{nextCursor ? '+' : ''})</h3>
         {users.length === 0 ? (
           <p>No users found. Create your first user!</p>
         ) : (
@@ -114,6 +117,11 @@ const Users: React.FC = () => {
             ))}
           </div>
         )}
+        {nextCursor && (
+          <button className="btn-primary" onClick={() => fetchUsers(nextCursor)}>
+            Load more
+          </button>
+        )}
       </div>
     </div>
   );
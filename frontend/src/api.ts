@@ -30,6 +30,53 @@ export const sendChatMessage = async (query: string): Promise<ChatResponse> => {
   return response.data;
 };
 
+export type ChatStreamEvent =
+  | { type: 'token'; content: string }
+  | { type: 'action'; action: Partial<ChatResponse> }
+  | { type: 'escalate'; model: string; reason: string }
+  | { type: 'final'; response: ChatResponse };
+
+// Streaming chat: calls onEvent for every NDJSON event and resolves with the final response
+export const streamChatMessage = async (
+  query: string,
+  onEvent: (event: ChatStreamEvent) => void
+): Promise<ChatResponse> => {
+  const response = await fetch(`${api.defaults.baseURL}/chat/stream`, {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify({ query }),
+  });
+  if (!response.ok || !response.body) {
+    throw new Error(`Chat stream failed with status ${response.status}`);
+  }
+
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+  let final: ChatResponse | null = null;
+
+  while (true) {
+    const { done, value } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+
+    let newline;
+    while ((newline = buffer.indexOf('\n')) >= 0) {
+      const line = buffer.slice(0, newline).trim();
+      buffer = buffer.slice(newline + 1);
+      if (!line) continue;
+      const event = JSON.parse(line) as ChatStreamEvent;
+      if (event.type === 'final') final = event.response;
+      onEvent(event);
+    }
+  }
+
+  if (!final) {
+    throw new Error('Chat stream ended without a final response');
+  }
+  return final;
+};
+
 // Legacy function for compatibility
 export const sendChat = async (query: string) => {
   const response = await fetch("http://localhost:8050/chat", {